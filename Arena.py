@@ -1,4 +1,5 @@
 import logging
+import math
 
 from tqdm import tqdm
 
@@ -13,7 +14,9 @@ class Arena():
     def __init__(self, player1, player2, game, display=None):
         """
         Input:
-            player 1,2: two functions that takes board as input, return action
+            player 1,2: two functions that takes board as input, return action.
+                        A player with a startGame attribute is called at
+                        the start of every game.
             game: Game object
             display: a function that takes board as input and prints it (e.g.
                      display in othello/OthelloGame). Is necessary for verbose
@@ -38,6 +41,9 @@ class Arena():
                 draw result returned from the game that is neither 1, -1, nor 0.
         """
         players = [self.player2, None, self.player1]
+        for player in players[0], players[2]:
+            if hasattr(player, "startGame"):
+                player.startGame()
         curPlayer = 1
         board = self.game.getInitBoard()
         it = 0
@@ -62,11 +68,16 @@ class Arena():
             self.display(board)
         return curPlayer * self.game.getGameEnded(board, curPlayer)
 
-    def playGames(self, num, verbose=False):
+    def playGames(self, num, verbose=False, sprt=None):
         """
         Plays num games in which player1 starts num/2 games and player2 starts
         num/2 games.
 
+        With sprt, a tuple (p0, p1, alpha, beta), player1 and player2 start in
+        turn, and the games stop as soon as sprtDecision(twoWon, oneWon, p0,
+        p1, alpha, beta) decides whether player2 wins a fraction p0 or p1 of
+        the decisive games.
+
         Returns:
             oneWon: games won by player1
             twoWon: games won by player2
@@ -77,6 +88,24 @@ class Arena():
         oneWon = 0
         twoWon = 0
         draws = 0
+        if sprt is not None:
+            for game in tqdm(range(2 * num), desc="Arena.playGames (SPRT)"):
+                if game % 2 == 0:
+                    gameResult = self.playGame(verbose=verbose)
+                else:
+                    self.player1, self.player2 = self.player2, self.player1
+                    gameResult = -self.playGame(verbose=verbose)
+                    self.player1, self.player2 = self.player2, self.player1
+                if gameResult == 1:
+                    oneWon += 1
+                elif gameResult == -1:
+                    twoWon += 1
+                else:
+                    draws += 1
+                if sprtDecision(twoWon, oneWon, *sprt) is not None:
+                    break
+            return oneWon, twoWon, draws
+
         for _ in tqdm(range(num), desc="Arena.playGames (1)"):
             gameResult = self.playGame(verbose=verbose)
             if gameResult == 1:
@@ -98,3 +127,21 @@ class Arena():
                 draws += 1
 
         return oneWon, twoWon, draws
+
+
+def sprtDecision(wins, losses, p0, p1, alpha, beta):
+    """
+    Sequential probability ratio test between H0: a player wins a fraction p0
+    of its decisive games, and H1: it wins a fraction p1 > p0, after it won
+    wins games and lost losses. alpha is the probability of accepting H1 when
+    H0 holds, beta that of accepting H0 when H1 holds.
+
+    Returns:
+        True if H1 is accepted, False if H0 is, None if more games are needed
+    """
+    llr = wins * math.log(p1 / p0) + losses * math.log((1 - p1) / (1 - p0))
+    if llr >= math.log((1 - beta) / alpha):
+        return True
+    if llr <= math.log(beta / (1 - alpha)):
+        return False
+    return None
@@ -0,0 +1,445 @@
+import logging
+
+import numpy as np
+
+from MCTS import bestUCBAction, mapPolicy
+
+log = logging.getLogger(__name__)
+
+
+class ArrayMCTS():
+    """
+    This class handles the MCTS tree, like MCTS, but keeps its statistics in
+    preallocated numpy arrays indexed by integer node ids instead of dicts
+    keyed by board strings.
+
+    A board is hashed once, when its node is created, and the node is keyed
+    by that hash (an int) rather than by the board string. After that the
+    search walks the tree through the children array and never rehashes a
+    board it has already seen. Boards aren't stored: each descent rebuilds
+    them from the board of its root, only the roots' boards are kept. The
+    statistics are float32. getActionProb returns the same policies as
+    MCTS.getActionProb.
+
+    Select it with args.mctsEngine = 'array'. args.mctsCapacity sets the
+    number of nodes allocated up front; the arrays grow by half when they
+    fill up. Set args.mctsBatchSize to evaluate leaves in batches, see
+    simulateBatch.
+    """
+
+    def __init__(self, game, nnet, args):
+        self.game = game
+        self.nnet = nnet
+        self.args = args
+        self.actionSize = game.getActionSize()
+
+        self.nodes = {}  # maps the hash of the string representation of a board to its node id
+        # with symmetryKeys, every board is replaced by the representative of its symmetry class
+        self.symmetryKeys = getattr(args, 'symmetryKeys', False)
+        self.rootBoards = {}  # maps the node id of the root of a search to its canonical board
+        self.size = 0  # number of node ids in use
+
+        capacity = getattr(args, 'mctsCapacity', 1024)
+        self.children = np.full((capacity, self.actionSize), -1, dtype=np.int32)  # node id reached by edge s,a
+        self.Nsa = np.zeros((capacity, self.actionSize), dtype=np.int32)  # stores #times edge s,a was visited
+        self.Wsa = np.zeros((capacity, self.actionSize), dtype=np.float32)  # stores the sum of values backed up through edge s,a
+        self.Ps = np.zeros((capacity, self.actionSize), dtype=np.float32)  # stores initial policy (returned by neural net)
+        self.Vs = np.zeros((capacity, self.actionSize), dtype=bool)  # stores game.getValidMoves for node s
+        self.Ns = np.zeros(capacity, dtype=np.int32)  # stores #times node s was visited
+        self.Es = np.zeros(capacity, dtype=np.float32)  # stores game.getGameEnded for node s
+        self.expanded = np.zeros(capacity, dtype=bool)  # whether node s has been evaluated by the neural net
+
+    def getActionProb(self, canonicalBoard, temp=1):
+        """
+        This function performs numMCTSSims simulations of MCTS starting from
+        canonicalBoard. If args.mctsBatchSize is more than 1, the simulations
+        are run in batches, see simulateBatch. args.symmetryKeys works as in
+        MCTS.getActionProb.
+
+        Returns:
+            probs: a policy vector where the probability of the ith action is
+                   proportional to Nsa[(s,a)]**(1./temp)
+        """
+        root, perm = self.startSearch(canonicalBoard)
+        batchSize = getattr(self.args, 'mctsBatchSize', 1)
+        sims = 0
+        while sims < self.args.numMCTSSims:
+            if batchSize > 1:
+                sims += self.simulateBatch(root, min(batchSize, self.args.numMCTSSims - sims))
+            else:
+                self.simulate(root)
+                sims += 1
+        return self.getRootProb(root, perm, temp)
+
+    def startSearch(self, canonicalBoard):
+        """
+        Returns the root node for a search from canonicalBoard, and the
+        permutation that maps the actions of the root back to those of
+        canonicalBoard (None without args.symmetryKeys).
+        """
+        perm = None
+        if self.symmetryKeys:
+            canonicalBoard, perm = self.game.getSymmetryCanonicalForm(canonicalBoard)
+        root = self.getNode(canonicalBoard)
+        self.rootBoards[root] = canonicalBoard
+        return root, perm
+
+    def getRootProb(self, root, perm, temp=1):
+        """
+        Returns the policy of getActionProb from the visit counts of root, as
+        returned by startSearch with perm.
+        """
+        counts = self.Nsa[root].tolist()
+        if perm is not None:
+            counts = mapPolicy(counts, perm).tolist()
+
+        if temp == 0:
+            bestAs = np.array(np.argwhere(counts == np.max(counts))).flatten()
+            bestA = np.random.choice(bestAs)
+            probs = [0] * len(counts)
+            probs[bestA] = 1
+            return probs
+
+        counts = [x ** (1. / temp) for x in counts]
+        counts_sum = float(sum(counts))
+        probs = [x / counts_sum for x in counts]
+        return probs
+
+    def search(self, canonicalBoard):
+        """
+        Performs one iteration of MCTS starting from canonicalBoard.
+
+        Returns:
+            v: the negative of the value of the current canonicalBoard
+        """
+        root, _ = self.startSearch(canonicalBoard)
+        return self.simulate(root)
+
+    def simulate(self, node):
+        """
+        Performs one iteration of MCTS starting from node, the root of a
+        search (see startSearch). The tree is
+        descended along the actions with the highest upper confidence bound
+        until a leaf or terminal node is found, and the value of that node is
+        backed up along the edges taken.
+
+        Returns:
+            v: the negative of the value of node
+        """
+        path, leaf, board = self.selectLeaf(node, self.rootBoards[node])
+        if self.Es[leaf] != 0:
+            # terminal node
+            v = -self.Es[leaf]
+        else:
+            # leaf node
+            v = -self.expand(leaf, board)
+        return self.backup(path, v)
+
+    def simulateBatch(self, node, batchSize):
+        """
+        Performs up to batchSize iterations of MCTS starting from node, with a
+        single call to nnet.predict_batch for all the leaves found.
+
+        Every descent adds a virtual loss of args.virtualLoss (1 by default)
+        to the edges it takes: they count as visited that many more times,
+        each time lost. This steers the next descents of the batch to other
+        leaves. Collection stops early when a descent reaches a leaf that is
+        already in the batch. The virtual losses are removed when the values
+        are backed up.
+
+        Returns:
+            sims: the number of iterations performed
+        """
+        pending, sims = self.collectLeaves(node, batchSize)
+        if pending:
+            self.backupLeaves(pending, self.expandBatch([leaf for _, leaf, _ in pending],
+                                                        [board for _, _, board in pending]))
+        return sims
+
+    def collectLeaves(self, node, batchSize):
+        """
+        The first half of simulateBatch: descends from node up to batchSize
+        times, with virtual loss, backing up the terminal nodes found. Once
+        the leaves have been evaluated, pass them to backupLeaves.
+
+        Returns:
+            pending: the (path, leaf, board) of every leaf waiting for the neural net
+            sims: the number of iterations started
+        """
+        virtualLoss = getattr(self.args, 'virtualLoss', 1)
+        pending = []  # the (path, leaf, board) of every leaf waiting for the neural net
+        pendingLeaves = set()
+        sims = 0
+        while sims < batchSize:
+            path, leaf, board = self.selectLeaf(node, self.rootBoards[node], virtualLoss)
+            if self.Es[leaf] != 0:
+                # terminal node, no need to wait for the neural net
+                self.backup(path, -self.Es[leaf], virtualLoss)
+            elif leaf in pendingLeaves:
+                self.backup(path, 0, virtualLoss, visit=False)
+                break
+            else:
+                pending.append((path, leaf, board))
+                pendingLeaves.add(leaf)
+            sims += 1
+        return pending, sims
+
+    def backupLeaves(self, pending, vs):
+        """
+        The second half of simulateBatch: backs up vs, the values of the
+        leaves in pending, removing the virtual losses.
+        """
+        virtualLoss = getattr(self.args, 'virtualLoss', 1)
+        for (path, _, _), v in zip(pending, vs):
+            self.backup(path, -v, virtualLoss)
+
+    def selectLeaf(self, node, board, virtualLoss=0):
+        """
+        Descends from node, whose canonical board is board, along the actions
+        with the highest upper confidence bound until a leaf or terminal node
+        is found, adding virtualLoss to the edges taken.
+
+        Returns:
+            path: the list of (node, action) edges taken
+            leaf: the node id where the descent stopped
+            board: the canonical board of leaf
+        """
+        path = []
+        while self.Es[node] == 0 and self.expanded[node]:
+            a = self.selectAction(node)
+            path.append((node, a))
+            if virtualLoss:
+                self.Wsa[node, a] -= virtualLoss
+                self.Nsa[node, a] += virtualLoss
+                self.Ns[node] += virtualLoss
+            node, board = self.getChild(node, board, a)
+        return path, node, board
+
+    def backup(self, path, v, virtualLoss=0, visit=True):
+        """
+        Propagates v, the negative of the value of the node at the end of
+        path, up the path, removing the virtualLoss added by selectLeaf. The
+        edges are not counted as visited if visit is False.
+
+        Returns:
+            v: the negative of the value of the node at the start of path
+        """
+        for node, a in reversed(path):
+            if visit:
+                self.Wsa[node, a] += v + virtualLoss
+                self.Nsa[node, a] += 1 - virtualLoss
+                self.Ns[node] += 1 - virtualLoss
+            else:
+                self.Wsa[node, a] += virtualLoss
+                self.Nsa[node, a] -= virtualLoss
+                self.Ns[node] -= virtualLoss
+            v = -v
+        return v
+
+    def selectAction(self, node):
+        """
+        Returns the valid action of node with the highest upper confidence
+        bound, see MCTS.bestUCBAction.
+        """
+        nsa = self.Nsa[node]
+        qsa = np.divide(self.Wsa[node], nsa, out=np.zeros(self.actionSize), where=nsa > 0)
+        return bestUCBAction(qsa, nsa, self.Ps[node], self.Ns[node], self.Vs[node], self.args.cpuct)
+
+    def expand(self, node, board):
+        """
+        Evaluates board, the board of a leaf node, with the neural net and
+        stores its policy.
+
+        Returns:
+            v: the value of node returned by the neural net
+        """
+        ps, v = self.nnet.predict(board)
+        self.setPolicy(node, board, ps)
+        return np.ravel(v)[0]  # wrappers return v as a scalar or a length 1 array
+
+    def expandBatch(self, nodes, boards):
+        """
+        Evaluates boards, the boards of several leaf nodes, with one call to
+        the neural net and stores their policies.
+
+        Returns:
+            vs: the values of nodes returned by the neural net
+        """
+        pis, vs = self.nnet.predict_batch(boards)
+        return self.setPolicies(nodes, boards, pis, vs)
+
+    def setPolicies(self, nodes, boards, pis, vs):
+        """
+        Stores the policies pis of several leaf nodes with the given boards,
+        evaluated together with their values vs.
+
+        Returns:
+            vs: the values of nodes, flattened
+        """
+        for node, board, ps in zip(nodes, boards, pis):
+            self.setPolicy(node, board, ps)
+        return np.ravel(vs)
+
+    def setPolicy(self, node, board, ps):
+        """
+        Stores the policy ps of node, whose canonical board is board, masked
+        to the valid moves and renormalized.
+        """
+        valids = self.game.getValidMoves(board, 1)
+        ps = ps * valids  # masking invalid moves
+        sum_Ps_s = np.sum(ps)
+        if sum_Ps_s > 0:
+            ps /= sum_Ps_s  # renormalize
+        else:
+            # if all valid moves were masked make all valid moves equally probable
+            # see MCTS.search for the reasons this can happen
+            log.error("All valid moves were masked, doing a workaround.")
+            ps = ps + valids
+            ps /= np.sum(ps)
+
+        self.Ps[node] = ps
+        self.Vs[node] = valids
+        self.expanded[node] = True
+
+    def reroot(self, canonicalBoard):
+        """
+        Makes canonicalBoard the root of the tree, to be called once a move
+        has been played. The nodes reachable from it keep their statistics,
+        so the subtree searched so far carries over to the next
+        getActionProb. Every other node is released and the arrays are
+        compacted. If canonicalBoard is not in the tree, the whole tree is
+        released.
+        """
+        if self.symmetryKeys:
+            canonicalBoard, _ = self.game.getSymmetryCanonicalForm(canonicalBoard)
+        root = self.nodes.get(self.getKey(canonicalBoard))
+        reachable = np.zeros(self.size, dtype=bool)
+        if root is not None:
+            reachable[root] = True
+            frontier = np.array([root])
+            while len(frontier):
+                children = self.children[frontier].ravel()
+                children = np.unique(children[children >= 0])
+                frontier = children[~reachable[children]]
+                reachable[frontier] = True
+        keep = np.flatnonzero(reachable)
+        newIds = np.full(self.size + 1, -1, dtype=np.int32)  # newIds[-1] maps a missing child to -1
+        newIds[keep] = np.arange(len(keep))
+
+        n = len(keep)
+        self.children[:n] = newIds[self.children[keep]]
+        self.Nsa[:n] = self.Nsa[keep]
+        self.Wsa[:n] = self.Wsa[keep]
+        self.Ps[:n] = self.Ps[keep]
+        self.Vs[:n] = self.Vs[keep]
+        self.Ns[:n] = self.Ns[keep]
+        self.Es[:n] = self.Es[keep]
+        self.expanded[:n] = self.expanded[keep]
+
+        self.children[n:self.size] = -1
+        self.Nsa[n:self.size] = 0
+        self.Wsa[n:self.size] = 0
+        self.Ps[n:self.size] = 0
+        self.Vs[n:self.size] = False
+        self.Ns[n:self.size] = 0
+        self.Es[n:self.size] = 0
+        self.expanded[n:self.size] = False
+
+        self.rootBoards = {int(newIds[root]): canonicalBoard} if root is not None else {}
+        self.nodes = {s: int(newIds[node]) for s, node in self.nodes.items() if reachable[node]}
+        self.size = n
+
+    def getNode(self, canonicalBoard):
+        """
+        Returns the node id of canonicalBoard, creating the node if the board
+        has not been seen before. With args.symmetryKeys, canonicalBoard must
+        already be the representative of its symmetry class.
+        """
+        s = self.getKey(canonicalBoard)
+        node = self.nodes.get(s)
+        if node is None:
+            node = self.addNode(s, canonicalBoard)
+        return node
+
+    def getKey(self, canonicalBoard):
+        """
+        Returns the key of canonicalBoard in nodes: the hash of its string
+        representation, a 64 bit int that takes less memory than the string.
+        """
+        return hash(self.game.stringRepresentation(canonicalBoard))
+
+    def getChild(self, node, board, a):
+        """
+        Returns the node id reached by playing action a from node, whose
+        canonical board is board, and the canonical board of that node.
+        """
+        childBoard = self.getChildBoard(board, a)
+        child = self.children[node, a]
+        if child < 0:
+            child = self.getNode(childBoard)
+            self.children[node, a] = child
+        return child, childBoard
+
+    def getChildBoard(self, board, a):
+        """
+        Returns the canonical board reached by playing action a from the
+        canonical board board (its representative with args.symmetryKeys).
+        """
+        next_s, next_player = self.game.getNextState(board, 1, a)
+        next_s = self.game.getCanonicalForm(next_s, next_player)
+        if self.symmetryKeys:
+            next_s, _ = self.game.getSymmetryCanonicalForm(next_s)
+        return next_s
+
+    def addNode(self, s, canonicalBoard):
+        if self.size == len(self.Ns):
+            self.grow()
+        node = self.size
+        self.size += 1
+        self.nodes[s] = node
+        self.Es[node] = self.game.getGameEnded(canonicalBoard, 1)
+        return node
+
+    def grow(self):
+        """
+        Adds half the number of nodes the arrays can hold, rather than
+        doubling it, so that less of the arrays sits unused.
+        """
+        extra = max(len(self.Ns) // 2, 1)
+        log.debug(f'Growing ArrayMCTS from {len(self.Ns)} to {len(self.Ns) + extra} nodes')
+        self.children = np.concatenate((self.children, np.full((extra, self.actionSize), -1, dtype=np.int32)))
+        self.Nsa = np.concatenate((self.Nsa, np.zeros((extra, self.actionSize), dtype=self.Nsa.dtype)))
+        self.Wsa = np.concatenate((self.Wsa, np.zeros((extra, self.actionSize), dtype=self.Wsa.dtype)))
+        self.Ps = np.concatenate((self.Ps, np.zeros((extra, self.actionSize), dtype=self.Ps.dtype)))
+        self.Vs = np.concatenate((self.Vs, np.zeros((extra, self.actionSize), dtype=bool)))
+        self.Ns = np.concatenate((self.Ns, np.zeros(extra, dtype=self.Ns.dtype)))
+        self.Es = np.concatenate((self.Es, np.zeros(extra, dtype=self.Es.dtype)))
+        self.expanded = np.concatenate((self.expanded, np.zeros(extra, dtype=bool)))
+
+
+def searchLockstep(searches, nnet, batchSize, numMCTSSims):
+    """
+    Advances searches that share nnet by one step each. A search is an object
+    with the mcts (an ArrayMCTS), root and sims (the iterations performed so
+    far) of a search started with startSearch. Each descends to up to
+    batchSize leaves, stopping at numMCTSSims iterations, and the leaves of
+    all the searches are evaluated with one nnet.predict_batch call.
+
+    Used to play several games in lockstep, see
+    Coach.executeEpisodesLockstep and BatchedArena.
+    """
+    pending = []
+    for search in searches:
+        leaves, sims = search.mcts.collectLeaves(search.root, min(batchSize, numMCTSSims - search.sims))
+        pending.append(leaves)
+        search.sims += sims
+    boards = [board for leaves in pending for _, _, board in leaves]
+    if boards:
+        pis, vs = nnet.predict_batch(boards)
+        start = 0
+        for search, leaves in zip(searches, pending):
+            end = start + len(leaves)
+            nodes = [leaf for _, leaf, _ in leaves]
+            search.mcts.backupLeaves(leaves, search.mcts.setPolicies(nodes, boards[start:end], pis[start:end],
+                                                                     vs[start:end]))
+            start = end
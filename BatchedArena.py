@@ -0,0 +1,125 @@
+import logging
+
+import numpy as np
+from tqdm import tqdm
+
+from Arena import sprtDecision
+from ArrayMCTS import ArrayMCTS, searchLockstep
+from utils import dotdict
+
+log = logging.getLogger(__name__)
+
+
+class BatchedArena():
+    """
+    Pits two networks against each other like an Arena of MCTS players
+    (Coach.getArenaPlayer), playing numGames games in lockstep in this
+    process.
+
+    Each game has an ArrayMCTS per player, with new trees for every game. At
+    every step the searches of all the games descend to up to
+    args.mctsBatchSize leaves (see ArrayMCTS.simulateBatch), and the leaves
+    waiting for each network are evaluated in one predict_batch call, so a
+    step makes at most two calls to the networks whatever the number of
+    games. A game that ends is replaced by the next one.
+    """
+
+    def __init__(self, nnet1, nnet2, game, args, numGames):
+        """
+        Input:
+            nnet 1,2: the networks of player 1 and 2
+            game: Game object
+            args: the MCTS arguments (numMCTSSims, cpuct, mctsBatchSize, ...)
+            numGames: number of games played at the same time
+        """
+        self.nnet1 = nnet1
+        self.nnet2 = nnet2
+        self.game = game
+        self.args = args
+        self.numGames = numGames
+
+    def playGames(self, num, sprt=None):
+        """
+        Plays num games in which player1 starts num/2 games and player2 starts
+        num/2 games, like Arena.playGames, sprt included. The results are
+        counted in the order the games were started, so with sprt the test
+        stops at the same game as Arena.playGames would.
+
+        Returns:
+            oneWon: games won by player1
+            twoWon: games won by player2
+            draws:  games won by nobody
+        """
+        num = int(num / 2)
+        if sprt is None:
+            starts = [i >= num for i in range(2 * num)]  # whether player2 starts each game
+        else:
+            # player1 and player2 start in turn, so that stopping early keeps the starts even
+            starts = [i % 2 == 1 for i in range(2 * num)]
+        batchSize = getattr(self.args, 'mctsBatchSize', 1)
+        reuseTree = getattr(self.args, 'reuseTree', False)
+        nnets = [self.nnet1] if self.nnet2 is self.nnet1 else [self.nnet1, self.nnet2]
+
+        oneWon = 0
+        twoWon = 0
+        draws = 0
+        games = []
+        started = 0
+        results = {}  # the results of the games that ended, for player1, until counted
+        counted = 0
+        decided = False
+        progress = tqdm(total=len(starts), desc="Arena.playGames (batched)")
+        while games or started < len(starts):
+            while len(games) < self.numGames and started < len(starts):
+                first, second = (self.nnet2, self.nnet1) if starts[started] else (self.nnet1, self.nnet2)
+                games.append(dotdict({'index': started, 'swapped': starts[started],
+                                      'board': self.game.getInitBoard(), 'curPlayer': 1,
+                                      'trees': {1: ArrayMCTS(self.game, first, self.args),
+                                                -1: ArrayMCTS(self.game, second, self.args)},
+                                      'root': None}))
+                started += 1
+
+            for g in games:
+                if g.root is None:
+                    # start the search of the player to move
+                    g.mcts = g.trees[g.curPlayer]
+                    g.canonicalBoard = self.game.getCanonicalForm(g.board, g.curPlayer)
+                    if reuseTree:
+                        g.mcts.reroot(g.canonicalBoard)
+                    g.root, g.perm = g.mcts.startSearch(g.canonicalBoard)
+                    g.sims = 0
+
+            # one step of every search, with a single call to each network
+            for nnet in nnets:
+                searchLockstep([g for g in games if g.mcts.nnet is nnet], nnet, batchSize, self.args.numMCTSSims)
+
+            # play the moves whose search is done
+            for g in list(games):
+                if g.sims < self.args.numMCTSSims:
+                    continue
+                action = np.argmax(g.mcts.getRootProb(g.root, g.perm, temp=0))
+                g.board, g.curPlayer = self.game.getNextState(g.board, g.curPlayer, action)
+                g.root = None
+
+                r = self.game.getGameEnded(g.board, g.curPlayer)
+                if r != 0:
+                    games = [other for other in games if other is not g]
+                    progress.update()
+                    results[g.index] = g.curPlayer * r * (-1 if g.swapped else 1)
+
+            # count the results in the order the games were started
+            while counted in results and not decided:
+                gameResult = results.pop(counted)
+                counted += 1
+                if gameResult == 1:
+                    oneWon += 1
+                elif gameResult == -1:
+                    twoWon += 1
+                else:
+                    draws += 1
+                decided = sprt is not None and sprtDecision(twoWon, oneWon, *sprt) is not None
+            if decided:
+                break
+        progress.close()
+
+        return oneWon, twoWon, draws
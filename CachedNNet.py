@@ -0,0 +1,115 @@
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from MCTS import mapPolicy
+from NeuralNet import NeuralNet
+
+log = logging.getLogger(__name__)
+
+
+class CachedNNet(NeuralNet):
+    """
+    This class wraps a NeuralNet and remembers the (policy, value) it
+    returned for the last maxSize boards, keyed by the string representation
+    of the canonical board. When the cache is full, the least recently used
+    board is evicted.
+
+    All the MCTS instances built on the same CachedNNet share its cache, so
+    positions that come up in many self-play games (openings in particular)
+    are evaluated by the network once. Calling train or load_checkpoint on
+    the CachedNNet changes the weights and clears the cache. Don't call them
+    on the wrapped network directly, or the cache will go stale.
+
+    With symmetries, boards are keyed by the representative of their
+    symmetry class (see Game.getSymmetryCanonicalForm), so the symmetrical
+    positions of a board share one evaluation. The network evaluates the
+    representative, and the policy is mapped back to the board it was asked
+    for.
+
+    hits and misses count the lookups since the counters were last reset.
+    """
+
+    def __init__(self, game, nnet, maxSize, symmetries=False):
+        self.game = game
+        self.nnet = nnet
+        self.maxSize = maxSize
+        self.symmetries = symmetries
+        self.cache = OrderedDict()  # maps a board string to its (pi, v), least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def predict(self, board):
+        perm = None
+        if self.symmetries:
+            board, perm = self.game.getSymmetryCanonicalForm(board)
+        s = self.game.stringRepresentation(board)
+        if s in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(s)
+            pi, v = self.cache[s]
+        else:
+            self.misses += 1
+            pi, v = self.nnet.predict(board)
+            self.store(s, pi, v)
+        return (pi, v) if perm is None else (mapPolicy(pi, perm), v)
+
+    def predict_batch(self, boards):
+        perms = None
+        if self.symmetries:
+            boards, perms = zip(*[self.game.getSymmetryCanonicalForm(board) for board in boards])
+        keys = [self.game.stringRepresentation(board) for board in boards]
+        results = [None] * len(boards)
+        missing = []
+        for i, s in enumerate(keys):
+            if s in self.cache:
+                self.cache.move_to_end(s)
+                results[i] = self.cache[s]
+            else:
+                missing.append(i)
+        self.hits += len(boards) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            pis, vs = self.nnet.predict_batch([boards[i] for i in missing])
+            for i, pi, v in zip(missing, pis, vs):
+                # copy, so the cache doesn't keep the whole batch alive
+                results[i] = (pi.copy(), v)
+                self.store(keys[i], *results[i])
+
+        pis, vs = zip(*results)
+        if perms is not None:
+            pis = [mapPolicy(pi, perm) for pi, perm in zip(pis, perms)]
+        # values cached by predict may be length 1 arrays
+        return np.array(pis), np.array([np.ravel(v)[0] for v in vs])
+
+    def store(self, s, pi, v):
+        self.cache[s] = (pi, v)
+        if len(self.cache) > self.maxSize:
+            self.cache.popitem(last=False)
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.
+
+    def resetCounters(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        """
+        Forgets every cached evaluation. Called whenever the weights change.
+        """
+        self.cache.clear()
+
+    def train(self, examples):
+        self.nnet.train(examples)
+        self.clear()
+
+    def save_checkpoint(self, folder='checkpoint', filename='checkpoint.pth.tar'):
+        self.nnet.save_checkpoint(folder=folder, filename=filename)
+
+    def load_checkpoint(self, folder='checkpoint', filename='checkpoint.pth.tar'):
+        self.nnet.load_checkpoint(folder=folder, filename=filename)
+        self.clear()
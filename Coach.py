@@ -1,5 +1,6 @@
 import logging
 import os
+import queue
 import sys
 from collections import deque
 from pickle import Pickler, Unpickler
@@ -8,8 +9,16 @@ from random import shuffle
 import numpy as np
 from tqdm import tqdm
 
-from Arena import Arena
-from MCTS import MCTS
+from Arena import Arena, sprtDecision
+from ArrayMCTS import ArrayMCTS, searchLockstep
+from BatchedArena import BatchedArena
+from CachedNNet import CachedNNet
+from InferenceServer import InferenceServer
+from MCTS import createMCTS
+from ParallelArena import MCTSPlayerFactory, ParallelArena
+from ReplayBuffer import ReplayBuffer
+from SymmetricExamples import SymmetricExamples
+from utils import dotdict, getSpawnContext
 
 log = logging.getLogger(__name__)
 
@@ -24,10 +33,29 @@ class Coach():
         self.game = game
         self.nnet = nnet
         self.pnet = self.nnet.__class__(self.game)  # the competitor network
+        self.nnetClass = self.nnet.__class__  # built by the self-play workers
         self.args = args
-        self.mcts = MCTS(self.game, self.nnet, self.args)
+        if getattr(self.args, 'evalCacheSize', 0) > 0:
+            # one cache per network, shared by all the MCTS instances using it
+            symmetries = getattr(self.args, 'symmetryKeys', False)
+            self.nnet = CachedNNet(self.game, self.nnet, self.args.evalCacheSize, symmetries)
+            self.pnet = CachedNNet(self.game, self.pnet, self.args.evalCacheSize, symmetries)
+        self.mcts = None  # the search tree of executeEpisode, created for each episode
         self.trainExamplesHistory = []  # history of examples from args.numItersForTrainExamplesHistory latest iterations
         self.skipFirstSelfPlay = False  # can be overriden in loadTrainExamples()
+        if getattr(self.args, 'lazySymmetries', False) and self.game.getSymmetryPermutations() is None:
+            raise ValueError("lazySymmetries needs a game whose getSymmetryPermutations isn't None")
+        if getattr(self.args, 'replayBuffer', False) and not isinstance(self.game.getInitBoard(), np.ndarray):
+            raise ValueError("replayBuffer needs a game whose boards are numpy arrays")
+        if getattr(self.args, 'asyncPipeline', False) and getattr(self.args, 'numSelfPlayWorkers', 0) <= 0:
+            raise ValueError("asyncPipeline needs numSelfPlayWorkers > 0")
+        self.replayBuffer = None  # replaces trainExamplesHistory with args.replayBuffer
+        if getattr(self.args, 'replayBuffer', False):
+            self.replayBuffer = ReplayBuffer(os.path.join(self.args.checkpoint, 'replay'),
+                                             self.args.numItersForTrainExamplesHistory)
+        self.selfPlayPool = None  # worker processes, started by the first selfPlayInPool()
+        self.inferenceServer = None  # evaluates the boards of the workers with args.inferenceServer
+        self.arenaGamesSaved = {}  # iteration -> arena games args.arenaSPRT didn't need to play
 
     def executeEpisode(self):
         """
@@ -54,11 +82,11 @@ class Coach():
             episodeStep += 1
             canonicalBoard = self.game.getCanonicalForm(board, self.curPlayer)
             temp = int(episodeStep < self.args.tempThreshold)
+            if getattr(self.args, 'reuseTree', False):
+                self.mcts.reroot(canonicalBoard)
 
             pi = self.mcts.getActionProb(canonicalBoard, temp=temp)
-            sym = self.game.getSymmetries(canonicalBoard, pi)
-            for b, p in sym:
-                trainExamples.append([b, self.curPlayer, p, None])
+            trainExamples.append([canonicalBoard, self.curPlayer, pi])
 
             action = np.random.choice(len(pi), p=pi)
             board, self.curPlayer = self.game.getNextState(board, self.curPlayer, action)
@@ -66,7 +94,88 @@ class Coach():
             r = self.game.getGameEnded(board, self.curPlayer)
 
             if r != 0:
-                return [(x[0], x[2], r * ((-1) ** (x[1] != self.curPlayer))) for x in trainExamples]
+                return self.getEpisodeExamples(trainExamples, r, self.curPlayer)
+
+    def getEpisodeExamples(self, positions, r, curPlayer):
+        """
+        Returns the (board, pi, v) examples of an episode that ended with
+        result r for curPlayer, from the [canonicalBoard, player, pi] of its
+        positions: all their forms, or with args.lazySymmetries only the
+        positions themselves, the symmetries being applied when training (see
+        SymmetricExamples). The forms are gathered with one
+        game.getSymmetriesBatch call if the game has symmetry permutations,
+        and with getSymmetries board by board otherwise.
+        """
+        boards, players, pis = zip(*positions)
+        vs = [r * ((-1) ** (player != curPlayer)) for player in players]
+        if getattr(self.args, 'lazySymmetries', False):
+            return list(zip(boards, pis, vs))
+        permutations = self.game.getSymmetryPermutations()
+        if permutations is None:
+            return [(b, p, v) for board, pi, v in zip(boards, pis, vs) for b, p in self.game.getSymmetries(board, pi)]
+        symBoards, symPis = self.game.getSymmetriesBatch(boards, pis)
+        numForms = len(permutations[0])
+        return list(zip(symBoards, symPis, [v for v in vs for _ in range(numForms)]))
+
+    def executeEpisodesLockstep(self):
+        """
+        Plays the numEps episodes of an iteration in this process,
+        args.numLockstepGames at a time. Each game has its own ArrayMCTS, and
+        the searches of all the games advance together: at every step, each
+        tree descends to up to args.mctsBatchSize leaves (see
+        ArrayMCTS.simulateBatch) and the leaves of all the trees are evaluated
+        with one nnet.predict_batch call. A game that ends is replaced by a
+        new one until numEps episodes have been started.
+
+        The moves and examples are the same as in executeEpisode.
+
+        Yields:
+            trainExamples: the examples of each episode, as returned by
+                           executeEpisode, in the order the episodes end
+        """
+        batchSize = getattr(self.args, 'mctsBatchSize', 1)
+        reuseTree = getattr(self.args, 'reuseTree', False)
+        games = []
+        started = 0
+        progress = tqdm(total=self.args.numEps, desc="Self Play")
+        while games or started < self.args.numEps:
+            while len(games) < self.args.numLockstepGames and started < self.args.numEps:
+                games.append(dotdict({'mcts': ArrayMCTS(self.game, self.nnet, self.args),
+                                      'board': self.game.getInitBoard(), 'curPlayer': 1, 'episodeStep': 0,
+                                      'trainExamples': [], 'root': None}))
+                started += 1
+
+            for g in games:
+                if g.root is None:
+                    # start the search of the next move
+                    g.episodeStep += 1
+                    g.canonicalBoard = self.game.getCanonicalForm(g.board, g.curPlayer)
+                    if reuseTree:
+                        g.mcts.reroot(g.canonicalBoard)
+                    g.root, g.perm = g.mcts.startSearch(g.canonicalBoard)
+                    g.sims = 0
+
+            # one step of every search, with a single call to the neural net
+            searchLockstep(games, self.nnet, batchSize, self.args.numMCTSSims)
+
+            # play the moves whose search is done
+            for g in list(games):
+                if g.sims < self.args.numMCTSSims:
+                    continue
+                temp = int(g.episodeStep < self.args.tempThreshold)
+                pi = g.mcts.getRootProb(g.root, g.perm, temp=temp)
+                g.trainExamples.append([g.canonicalBoard, g.curPlayer, pi])
+
+                action = np.random.choice(len(pi), p=pi)
+                g.board, g.curPlayer = self.game.getNextState(g.board, g.curPlayer, action)
+                g.root = None
+
+                r = self.game.getGameEnded(g.board, g.curPlayer)
+                if r != 0:
+                    games = [other for other in games if other is not g]
+                    progress.update()
+                    yield self.getEpisodeExamples(g.trainExamples, r, g.curPlayer)
+        progress.close()
 
     def learn(self):
         """
@@ -75,7 +184,12 @@ class Coach():
         examples in trainExamples (which has a maximum length of maxlenofQueue).
         It then pits the new neural network against the old one and accepts it
         only if it wins >= updateThreshold fraction of games.
+
+        With args.asyncPipeline, see learnAsync.
         """
+        if getattr(self.args, 'asyncPipeline', False):
+            self.learnAsync()
+            return
 
         for i in range(1, self.args.numIters + 1):
             # bookkeeping
@@ -84,42 +198,41 @@ class Coach():
             if not self.skipFirstSelfPlay or i > 1:
                 iterationTrainExamples = deque([], maxlen=self.args.maxlenOfQueue)
 
-                for _ in tqdm(range(self.args.numEps), desc="Self Play"):
-                    self.mcts = MCTS(self.game, self.nnet, self.args)  # reset search tree
-                    iterationTrainExamples += self.executeEpisode()
+                if getattr(self.args, 'numSelfPlayWorkers', 0) > 0:
+                    for examples in self.selfPlayInPool(i):
+                        iterationTrainExamples += examples
+                elif getattr(self.args, 'numLockstepGames', 0) > 1:
+                    for examples in self.executeEpisodesLockstep():
+                        iterationTrainExamples += examples
+                else:
+                    for _ in tqdm(range(self.args.numEps), desc="Self Play"):
+                        self.mcts = createMCTS(self.game, self.nnet, self.args)  # reset search tree
+                        iterationTrainExamples += self.executeEpisode()
 
-                # save the iteration examples to the history 
-                self.trainExamplesHistory.append(iterationTrainExamples)
+                if isinstance(self.nnet, CachedNNet):
+                    log.info(f'Eval cache hit rate: {self.nnet.hitRate():.1%} '
+                             f'({self.nnet.hits} hits, {self.nnet.misses} misses)')
+                    self.nnet.resetCounters()
 
-            if len(self.trainExamplesHistory) > self.args.numItersForTrainExamplesHistory:
-                log.warning(
-                    f"Removing the oldest entry in trainExamples. len(trainExamplesHistory) = {len(self.trainExamplesHistory)}")
-                self.trainExamplesHistory.pop(0)
-            # backup history to a file
-            # NB! the examples were collected using the model from the previous iteration, so (i-1)  
-            self.saveTrainExamples(i - 1)
+                self.addIterationExamples(i, iterationTrainExamples)
 
-            # shuffle examples before training
-            trainExamples = []
-            for e in self.trainExamplesHistory:
-                trainExamples.extend(e)
-            shuffle(trainExamples)
+            trainExamples = self.getTrainExamples(i)
 
             # training new network, keeping a copy of the old one
             self.nnet.save_checkpoint(folder=self.args.checkpoint, filename='temp.pth.tar')
             self.pnet.load_checkpoint(folder=self.args.checkpoint, filename='temp.pth.tar')
-            pmcts = MCTS(self.game, self.pnet, self.args)
 
             self.nnet.train(trainExamples)
-            nmcts = MCTS(self.game, self.nnet, self.args)
 
             log.info('PITTING AGAINST PREVIOUS VERSION')
-            arena = Arena(lambda x: np.argmax(pmcts.getActionProb(x, temp=0)),
-                          lambda x: np.argmax(nmcts.getActionProb(x, temp=0)), self.game)
-            pwins, nwins, draws = arena.playGames(self.args.arenaCompare)
+            if getattr(self.args, 'numArenaWorkers', 0) > 0:
+                pwins, nwins, draws = self.playArenaInPool(i)
+            else:
+                pwins, nwins, draws = self.playArena()
 
             log.info('NEW/PREV WINS : %d / %d ; DRAWS : %d' % (nwins, pwins, draws))
-            if pwins + nwins == 0 or float(nwins) / (pwins + nwins) < self.args.updateThreshold:
+            self.recordArenaGames(i, pwins, nwins, draws)
+            if not self.isAccepted(pwins, nwins):
                 log.info('REJECTING NEW MODEL')
                 self.nnet.load_checkpoint(folder=self.args.checkpoint, filename='temp.pth.tar')
             else:
@@ -127,9 +240,292 @@ class Coach():
                 self.nnet.save_checkpoint(folder=self.args.checkpoint, filename=self.getCheckpointFile(i))
                 self.nnet.save_checkpoint(folder=self.args.checkpoint, filename='best.pth.tar')
 
+        self.stopSelfPlayPool()
+
+    def learnAsync(self):
+        """
+        Performs numIters iterations like learn, as a pipeline in which
+        self-play, training and gating run at the same time:
+
+        - the args.numSelfPlayWorkers self-play workers always have up to
+          numEps episodes queued, and play each one with the newest accepted
+          network.
+        - this process trains the network every time numEps new episodes
+          have been played, and saves it as a candidate.
+        - a gating process pits the candidates against the best network, in
+          turn, and publishes a candidate to the self-play workers when it
+          wins >= updateThreshold fraction of games. With
+          args.inferenceServer, it has the server load the candidate before
+          publishing it.
+
+        Iterations are markers rather than barriers: the episodes of an
+        iteration may be played by several versions of the network, and the
+        trainer neither waits for a candidate's gating nor reverts to the
+        best network when a candidate is rejected.
+        """
+        context = getSpawnContext()
+        accepted = context.Value('i', 0)  # the iteration of the network the self-play workers play with
+        self.nnet.save_checkpoint(folder=self.args.checkpoint, filename=self.getCheckpointFile(0))
+        self.startSelfPlayPool(accepted)
+        if self.inferenceServer is not None:
+            self.inferenceServer.load_checkpoint(folder=self.args.checkpoint, filename=self.getCheckpointFile(0))
+        # from here on, only the gating process loads networks into the inference server
+        loader = self.inferenceServer.loader if self.inferenceServer is not None else None
+        gatingPool = context.Pool(1, initializer=initGatingWorker,
+                                  initargs=(self.game, self.nnetClass, self.args, accepted, loader))
+
+        firstSelfPlay = 2 if self.skipFirstSelfPlay else 1
+        numEpisodes = self.args.numEps * (self.args.numIters - firstSelfPlay + 1)
+        episodes = queue.Queue()  # the examples of the episodes played, put by the pool's result thread
+        submitted = 0
+
+        def submitEpisodes(played):
+            # keeps numEps episodes queued, or fewer if that is more than the iterations left need
+            nonlocal submitted
+            while submitted < min(played + self.args.numEps, numEpisodes):
+                task = (None, int(np.random.randint(2 ** 31)))  # None: the newest accepted network
+                self.selfPlayPool.apply_async(playSelfPlayEpisode, (task,), callback=episodes.put,
+                                              error_callback=episodes.put)
+                submitted += 1
+
+        played = 0
+        submitEpisodes(played)
+        gating = []  # the results of the gating matches not logged yet
+        for i in range(1, self.args.numIters + 1):
+            log.info(f'Starting Iter #{i} ...')
+            if i >= firstSelfPlay:
+                iterationTrainExamples = deque([], maxlen=self.args.maxlenOfQueue)
+                for _ in tqdm(range(self.args.numEps), desc="Self Play"):
+                    examples = episodes.get()
+                    if isinstance(examples, BaseException):
+                        raise examples
+                    iterationTrainExamples += examples
+                    played += 1
+                    submitEpisodes(played)
+                self.addIterationExamples(i, iterationTrainExamples)
+
+            self.nnet.train(self.getTrainExamples(i))
+            self.nnet.save_checkpoint(folder=self.args.checkpoint, filename=self.getCandidateFile(i))
+            gating.append(gatingPool.apply_async(playGatingMatch, (i,)))
+            gating = self.logGatingMatches(gating)
+
+        gatingPool.close()
+        gatingPool.join()
+        self.logGatingMatches(gating)
+        self.stopSelfPlayPool()
+
+    def logGatingMatches(self, gating):
+        """
+        Logs the gating matches of learnAsync that are over. Returns the
+        results of those that aren't.
+        """
+        for result in [result for result in gating if result.ready()]:
+            i, (pwins, nwins, draws), accept = result.get()
+            log.info(f'Iter #{i} NEW/PREV WINS : {nwins} / {pwins} ; DRAWS : {draws}')
+            self.recordArenaGames(i, pwins, nwins, draws)
+            log.info(f'Iter #{i} {"ACCEPTING" if accept else "REJECTING"} NEW MODEL')
+        return [result for result in gating if not result.ready()]
+
+    def addIterationExamples(self, iteration, iterationTrainExamples):
+        if self.replayBuffer is not None:
+            # a new shard, the oldest expires past numItersForTrainExamplesHistory
+            self.replayBuffer.addShard(iterationTrainExamples)
+        else:
+            # save the iteration examples to the history
+            self.trainExamplesHistory.append(iterationTrainExamples)
+
+    def getTrainExamples(self, iteration):
+        """
+        Returns the examples to train on in iteration: the replay buffer, or
+        the shuffled examples of trainExamplesHistory, which is saved first.
+        """
+        if self.replayBuffer is not None:
+            # the networks sample the buffer, it is neither loaded nor shuffled
+            trainExamples = self.replayBuffer
+        else:
+            if len(self.trainExamplesHistory) > self.args.numItersForTrainExamplesHistory:
+                log.warning(
+                    f"Removing the oldest entry in trainExamples. len(trainExamplesHistory) = {len(self.trainExamplesHistory)}")
+                self.trainExamplesHistory.pop(0)
+            # backup history to a file
+            # NB! the examples were collected using the model from the previous iteration, so (i-1)
+            self.saveTrainExamples(iteration - 1)
+
+            # shuffle examples before training
+            trainExamples = []
+            for e in self.trainExamplesHistory:
+                trainExamples.extend(e)
+            shuffle(trainExamples)
+        if getattr(self.args, 'lazySymmetries', False):
+            trainExamples = SymmetricExamples(self.game, trainExamples)
+        return trainExamples
+
+    def selfPlayInPool(self, iteration):
+        """
+        Plays the numEps episodes of an iteration in args.numSelfPlayWorkers
+        processes. The workers are started once, each with its own copy of
+        the game and network, and load the network saved here (selfplay.pth.tar)
+        when they get the first episode of a new iteration.
+
+        With args.inferenceServer, the workers hold no network: they send
+        their boards to an InferenceServer process, which evaluates the
+        boards of all the workers in batches (see args.inferenceMaxBatch and
+        args.inferenceMaxWait) and loads selfplay.pth.tar instead.
+
+        Every episode is given its own seed, drawn from np.random, so the
+        workers play different games and a seeded run can be repeated.
+
+        Yields:
+            trainExamples: the examples of each episode, as returned by
+                           executeEpisode, in the order the episodes end
+        """
+        self.nnet.save_checkpoint(folder=self.args.checkpoint, filename='selfplay.pth.tar')
+        if self.selfPlayPool is None:
+            self.startSelfPlayPool()
+        if self.inferenceServer is not None:
+            self.inferenceServer.load_checkpoint(folder=self.args.checkpoint, filename='selfplay.pth.tar')
+
+        seeds = np.random.randint(2 ** 31, size=self.args.numEps)
+        tasks = [(iteration, int(seed)) for seed in seeds]
+        yield from tqdm(self.selfPlayPool.imap_unordered(playSelfPlayEpisode, tasks), total=len(tasks),
+                        desc="Self Play")
+
+    def playArena(self):
+        """
+        Pits nnet against pnet for args.arenaCompare games, each network
+        searching with its own tree. With args.arenaLockstepGames, the games
+        are played that many at a time by a BatchedArena, with the search
+        trees of its games.
+
+        Returns:
+            pwins, nwins, draws: as returned by Arena.playGames
+        """
+        if getattr(self.args, 'arenaLockstepGames', 0) > 1:
+            arena = BatchedArena(self.pnet, self.nnet, self.game, self.args, self.args.arenaLockstepGames)
+        else:
+            pmcts = createMCTS(self.game, self.pnet, self.args)
+            nmcts = createMCTS(self.game, self.nnet, self.args)
+            arena = Arena(self.getArenaPlayer(pmcts), self.getArenaPlayer(nmcts), self.game)
+        return arena.playGames(self.args.arenaCompare, sprt=self.getSPRT())
+
+    def playArenaInPool(self, iteration):
+        """
+        Pits the network trained in iteration against the previous one
+        (temp.pth.tar) in args.numArenaWorkers processes, see ParallelArena.
+        Each game is played with new search trees.
+
+        Returns:
+            pwins, nwins, draws: as returned by Arena.playGames
+        """
+        folder = self.args.checkpoint
+        candidateFile = self.getCandidateFile(iteration)
+        self.nnet.save_checkpoint(folder=folder, filename=candidateFile)
+        arena = ParallelArena(MCTSPlayerFactory(self.nnetClass, folder, 'temp.pth.tar', self.args),
+                              MCTSPlayerFactory(self.nnetClass, folder, candidateFile, self.args),
+                              self.game, self.args.numArenaWorkers)
+        result = arena.playGames(self.args.arenaCompare, sprt=self.getSPRT())
+        if os.path.isfile(os.path.join(folder, candidateFile)):
+            os.remove(os.path.join(folder, candidateFile))
+        return result
+
+    def getSPRT(self):
+        """
+        Returns the sprt argument of Arena.playGames for args.arenaSPRT, None
+        without it. The test is between the new network winning
+        updateThreshold -/+ args.sprtMargin of the decisive games, with error
+        rates args.sprtAlpha and args.sprtBeta.
+        """
+        if not getattr(self.args, 'arenaSPRT', False):
+            return None
+        margin = getattr(self.args, 'sprtMargin', 0.1)
+        p0 = max(self.args.updateThreshold - margin, 0.01)
+        p1 = min(self.args.updateThreshold + margin, 0.99)
+        return p0, p1, getattr(self.args, 'sprtAlpha', 0.05), getattr(self.args, 'sprtBeta', 0.05)
+
+    def isAccepted(self, pwins, nwins):
+        """
+        Whether the new network, which won nwins arena games and lost pwins,
+        replaces the previous one: if it won >= updateThreshold fraction of
+        the decisive games or, with args.arenaSPRT, if the test accepted it
+        before all the games were played.
+        """
+        sprt = self.getSPRT()
+        if sprt is not None:
+            decision = sprtDecision(nwins, pwins, *sprt)
+            if decision is not None:
+                return decision
+        return pwins + nwins > 0 and float(nwins) / (pwins + nwins) >= self.args.updateThreshold
+
+    def recordArenaGames(self, iteration, pwins, nwins, draws):
+        sprt = self.getSPRT()
+        if sprt is None:
+            return
+        played = pwins + nwins + draws
+        self.arenaGamesSaved[iteration] = 2 * int(self.args.arenaCompare / 2) - played
+        if sprtDecision(nwins, pwins, *sprt) is None:
+            log.info(f'SPRT undecided after {played} arena games, gating on updateThreshold')
+        else:
+            log.info(f'SPRT decided after {played} arena games, {self.arenaGamesSaved[iteration]} saved '
+                     f'({sum(self.arenaGamesSaved.values())} so far)')
+
+    def startSelfPlayPool(self, accepted=None):
+        """
+        Starts the args.numSelfPlayWorkers processes of selfPlayInPool and
+        learnAsync, and the InferenceServer of args.inferenceServer.
+        accepted is the shared iteration number of the network learnAsync
+        plays with.
+        """
+        context = getSpawnContext()
+        clients = clientIds = None
+        if getattr(self.args, 'inferenceServer', False):
+            self.inferenceServer = InferenceServer(self.game, self.nnetClass, self.args.numSelfPlayWorkers,
+                                                   getattr(self.args, 'inferenceMaxBatch', 64),
+                                                   getattr(self.args, 'inferenceMaxWait', 0.002))
+            clients = self.inferenceServer.clients
+            clientIds = context.Queue()  # each worker takes one
+            for clientId in range(len(clients)):
+                clientIds.put(clientId)
+        self.selfPlayPool = context.Pool(self.args.numSelfPlayWorkers, initializer=initSelfPlayWorker,
+                                         initargs=(self.game, self.nnetClass, self.args, clients, clientIds, accepted))
+
+    def stopSelfPlayPool(self):
+        if self.selfPlayPool is not None:
+            self.selfPlayPool.close()
+            self.selfPlayPool.join()
+            self.selfPlayPool = None
+        if self.inferenceServer is not None:
+            self.inferenceServer.stop()
+            self.inferenceServer = None
+
+    def getArenaPlayer(self, mcts):
+        """
+        Returns an Arena player that plays the most visited action of mcts.
+        With args.reuseTree, the tree is re-rooted at every board the player
+        is given, which keeps the subtree searched since its last move and
+        releases the rest, and replaced by a new one at the start of every
+        game.
+        """
+        reuseTree = getattr(self.args, 'reuseTree', False)
+
+        def play(canonicalBoard):
+            if reuseTree:
+                mcts.reroot(canonicalBoard)
+            return np.argmax(mcts.getActionProb(canonicalBoard, temp=0))
+
+        def startGame():
+            nonlocal mcts
+            mcts = createMCTS(self.game, mcts.nnet, self.args)
+
+        if reuseTree:
+            play.startGame = startGame
+        return play
+
     def getCheckpointFile(self, iteration):
         return 'checkpoint_' + str(iteration) + '.pth.tar'
 
+    def getCandidateFile(self, iteration):
+        return 'candidate_' + str(iteration) + '.pth.tar'
+
     def saveTrainExamples(self, iteration):
         folder = self.args.checkpoint
         if not os.path.exists(folder):
@@ -140,6 +536,9 @@ class Coach():
         f.closed
 
     def loadTrainExamples(self):
+        if self.replayBuffer is not None:
+            self.loadReplayBuffer()
+            return
         modelFile = os.path.join(self.args.load_folder_file[0], self.args.load_folder_file[1])
         examplesFile = modelFile + ".examples"
         if not os.path.isfile(examplesFile):
@@ -155,3 +554,96 @@ class Coach():
 
             # examples based on the model were already collected (loaded)
             self.skipFirstSelfPlay = True
+
+    def loadReplayBuffer(self):
+        """
+        Opens the replay buffer saved next to the model in
+        args.load_folder_file, copied into the replay buffer of
+        args.checkpoint, which the new shards are added to from then on.
+        """
+        folder = os.path.join(self.args.load_folder_file[0], 'replay')
+        self.replayBuffer.load(folder)
+        if len(self.replayBuffer) == 0:
+            log.warning(f'No replay buffer shards found in "{folder}"!')
+            r = input("Continue? [y|n]")
+            if r != "y":
+                sys.exit()
+        else:
+            log.info(f'Replay buffer with {len(self.replayBuffer)} examples found.')
+            # examples based on the model were already collected (loaded)
+            self.skipFirstSelfPlay = True
+
+
+class SelfPlayWorker(Coach):
+    """
+    The Coach of a self-play worker process, see Coach.selfPlayInPool. It
+    only plays episodes, so it has no competitor network.
+    """
+
+    def __init__(self, game, nnet, args, accepted=None):
+        self.game = game
+        self.nnet = nnet
+        self.args = args
+        if getattr(self.args, 'evalCacheSize', 0) > 0:
+            self.nnet = CachedNNet(self.game, self.nnet, self.args.evalCacheSize,
+                                   getattr(self.args, 'symmetryKeys', False))
+        self.iteration = None  # the iteration whose network is loaded
+        self.accepted = accepted  # see Coach.learnAsync
+
+
+worker = None  # the SelfPlayWorker of a worker process, or the Coach of the gating process
+
+
+def initSelfPlayWorker(game, nnetClass, args, clients=None, clientIds=None, accepted=None):
+    global worker
+    nnet = nnetClass(game) if clients is None else clients[clientIds.get()]
+    worker = SelfPlayWorker(game, nnet, args, accepted)
+
+
+def playSelfPlayEpisode(task):
+    iteration, seed = task
+    filename = 'selfplay.pth.tar'
+    if iteration is None:
+        # Coach.learnAsync: the newest network accepted by the gating process
+        iteration = worker.accepted.value
+        filename = worker.getCheckpointFile(iteration)
+    if worker.iteration != iteration:
+        # with an InferenceClient, this only clears the evaluation cache
+        worker.nnet.load_checkpoint(folder=worker.args.checkpoint, filename=filename)
+        worker.iteration = iteration
+    np.random.seed(seed)
+    worker.mcts = createMCTS(worker.game, worker.nnet, worker.args)  # reset search tree
+    return worker.executeEpisode()
+
+
+def initGatingWorker(game, nnetClass, args, accepted, loader=None):
+    global worker
+    worker = Coach(game, nnetClass(game), args)
+    worker.accepted = accepted
+    worker.loader = loader  # the InferenceLoader of the inference server, if any
+
+
+def playGatingMatch(iteration):
+    """
+    Pits the candidate network of iteration against the accepted one, for
+    Coach.learnAsync. An accepted candidate is saved as its iteration's
+    checkpoint and best.pth.tar, and loaded by the inference server, before
+    the self-play workers are told to use it.
+    """
+    folder = worker.args.checkpoint
+    worker.pnet.load_checkpoint(folder=folder, filename=worker.getCheckpointFile(worker.accepted.value))
+    worker.nnet.load_checkpoint(folder=folder, filename=worker.getCandidateFile(iteration))
+
+    pwins, nwins, draws = worker.playArena()
+
+    accept = worker.isAccepted(pwins, nwins)
+    if accept:
+        worker.nnet.save_checkpoint(folder=folder, filename=worker.getCheckpointFile(iteration))
+        worker.nnet.save_checkpoint(folder=folder, filename='best.pth.tar')
+        if worker.loader is not None:
+            worker.loader.load_checkpoint(folder=folder, filename=worker.getCheckpointFile(iteration))
+        worker.accepted.value = iteration
+    candidateFile = os.path.join(folder, worker.getCandidateFile(iteration))
+    if os.path.isfile(candidateFile):
+        os.remove(candidateFile)
+    return iteration, (pwins, nwins, draws), accept
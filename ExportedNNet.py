@@ -0,0 +1,83 @@
+import logging
+import os
+
+import numpy as np
+
+from NeuralNet import NeuralNet
+
+log = logging.getLogger(__name__)
+
+
+class ExportedNNet(NeuralNet):
+    """
+    This class serves the predictions of a network exported by export.py,
+    for playing only: it can't be trained or saved.
+
+    load_checkpoint picks the backend from the file extension: TorchScript
+    for .pt files, ONNX Runtime on CPU for .onnx files. Given a name
+    without extension, it loads name.onnx if ONNX Runtime is installed and
+    the file exists, else name.pt. Neither needs the model code, and the
+    ONNX backend doesn't import pytorch at all.
+
+    Like the other wrappers, an ExportedNNet is built from the game and
+    loaded with load_checkpoint, so it can stand in for one wherever a
+    network class is expected (MCTSPlayerFactory, for instance).
+    """
+
+    def __init__(self, game):
+        self.board_x, self.board_y = game.getBoardSize()
+        self.run = None  # float32 boards -> (pis, vs), once loaded
+
+    def train(self, examples):
+        raise NotImplementedError('An exported network can only play, train the network it was exported from.')
+
+    def predict(self, board):
+        """
+        board: np array with board, or a tafl Board
+        """
+        pis, vs = self.predict_batch([board])
+        return pis[0], vs[0]
+
+    def predict_batch(self, boards):
+        """
+        boards: list of boards, np arrays or anything with astype (tafl Board)
+        """
+        boards = np.array([board.astype(np.float32) for board in boards]).reshape(-1, self.board_x, self.board_y)
+        return self.run(boards)
+
+    def save_checkpoint(self, folder='checkpoint', filename='best.pt'):
+        raise NotImplementedError('An exported network can\'t be saved, export the checkpoint again.')
+
+    def load_checkpoint(self, folder='checkpoint', filename='best.pt'):
+        if not filename.endswith(('.pt', '.onnx')):
+            onnx = os.path.join(folder, filename + '.onnx')
+            filename += '.onnx' if os.path.exists(onnx) and hasOnnxRuntime() else '.pt'
+        filepath = os.path.join(folder, filename)
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f'No exported model in path {filepath}')
+
+        if filename.endswith('.onnx'):
+            import onnxruntime  # optional, only for .onnx files
+
+            session = onnxruntime.InferenceSession(filepath, providers=['CPUExecutionProvider'])
+            self.run = lambda boards: tuple(session.run(None, {'boards': boards}))
+        else:
+            import torch
+
+            model = torch.jit.load(filepath, map_location='cpu')
+
+            def run(boards):
+                with torch.inference_mode():
+                    pis, vs = model(torch.from_numpy(boards))
+                return pis.numpy(), vs.numpy()
+
+            self.run = run
+        log.info(f'Loaded {filepath}')
+
+
+def hasOnnxRuntime():
+    try:
+        import onnxruntime
+    except ImportError:
+        return False
+    return True
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class Game():
     """
     This class specifies the base Game class. To define your own game, subclass
@@ -98,8 +101,82 @@ class Game():
             symmForms: a list of [(board,pi)] where each tuple is a symmetrical
                        form of the board and the corresponding pi vector. This
                        is used when training the neural network from examples.
+
+        A game that builds the tables of getSymmetryPermutations needs no
+        override: the default gathers the forms with them.
         """
-        pass
+        if hasattr(self, 'boardPerms'):
+            assert len(pi) == self.piPerms.shape[1]
+            boards = np.ravel(board)[self.boardPerms].reshape((-1,) + np.shape(board))
+            return list(zip(boards, np.asarray(pi)[self.piPerms]))
+
+    def getSymmetryPermutations(self):
+        """
+        Returns:
+            boardPerms: an array of numSymmetries x board cells indices, so
+                        that np.ravel(board)[boardPerms[k]] is the kth
+                        symmetrical form of board, flattened
+            piPerms: an array of numSymmetries x getActionSize() indices, so
+                     that pi[piPerms[k]] is the policy for that form
+
+            or None if the game has no such tables.
+
+        Used to gather the symmetries of many boards at once, see
+        getSymmetriesBatch and SymmetricExamples. The default returns the
+        tables self.boardPerms and self.piPerms of the games that build them
+        (with symmetryPermutations, in their __init__), and None otherwise.
+        """
+        if not hasattr(self, 'boardPerms'):
+            return None
+        return self.boardPerms, self.piPerms
+
+    def getSymmetriesBatch(self, boards, pis):
+        """
+        Input:
+            boards: an array of boards
+            pis: an array of their policy vectors
+
+        Returns:
+            symBoards, symPis: arrays of the symmetrical forms of every board
+                               and pi, as returned by getSymmetries, board
+                               after board.
+
+        The default gathers them with getSymmetryPermutations, or calls
+        getSymmetries for each board if it returns None.
+        """
+        permutations = self.getSymmetryPermutations()
+        if permutations is None:
+            forms = [form for board, pi in zip(boards, pis) for form in self.getSymmetries(board, pi)]
+            return np.array([b for b, _ in forms]), np.array([p for _, p in forms])
+        boardPerms, piPerms = permutations
+        boards, pis = np.asarray(boards), np.asarray(pis)
+        symBoards = boards.reshape(len(boards), -1)[:, boardPerms]
+        return symBoards.reshape((-1,) + boards.shape[1:]), pis[:, piPerms].reshape(-1, pis.shape[1])
+
+    def getSymmetryCanonicalForm(self, board):
+        """
+        Input:
+            board: current board in its canonical form
+
+        Returns:
+            symBoard: the representative of the symmetry class of board: of
+                      the boards returned by getSymmetries, the one with the
+                      smallest stringRepresentation. Boards that are
+                      symmetrical to each other share the same symBoard.
+            perm: a permutation of the actions such that action a on
+                  symBoard is action perm[a] on board. A policy pi for
+                  symBoard is mapped back to board by newPi[perm] = pi.
+
+        The default derives both from getSymmetries, so it needs no changes
+        to a game whose getSymmetries reorders pi without looking at its
+        values.
+        """
+        best = None
+        for symBoard, perm in self.getSymmetries(board, np.arange(self.getActionSize())):
+            s = self.stringRepresentation(symBoard)
+            if best is None or s < best[0]:
+                best = (s, symBoard, perm)
+        return best[1], np.asarray(best[2], dtype=np.int64)
 
     def stringRepresentation(self, board):
         """
@@ -111,3 +188,67 @@ class Game():
                          Required by MCTS for hashing.
         """
         pass
+
+    def getBoardHash(self, board):
+        """
+        Optional: games that implement getBoardHash, getNextStateHash and
+        getCanonicalHash let MCTS key its states by boardHash, updated with a
+        few XORs per move (see ZobristHash), instead of building a
+        stringRepresentation at every node.
+
+        Input:
+            board: current board
+
+        Returns:
+            boardHash: a hashable value that identifies board like its
+                       stringRepresentation does, or None if the game
+                       doesn't implement hashing.
+
+        A game whose canonical form negates the board can keep a ZobristHash
+        in self.zobrist: the defaults of getBoardHash and getCanonicalHash
+        then use its hash pairs, and only getNextStateHash is left to write.
+        """
+        if hasattr(self, 'zobrist'):
+            return self.zobrist.hashPair(board)
+        return None
+
+    def getNextStateHash(self, board, player, action, boardHash):
+        """
+        Input:
+            board, player, action: as for getNextState
+            boardHash: getBoardHash(board)
+
+        Returns:
+            nextBoard, nextPlayer: as returned by getNextState
+            nextHash: getBoardHash(nextBoard), updated from boardHash
+        """
+        pass
+
+    def getCanonicalHash(self, boardHash, player):
+        """
+        Input:
+            boardHash: getBoardHash(board)
+            player: current player (1 or -1)
+
+        Returns:
+            canonicalHash: getBoardHash(getCanonicalForm(board, player))
+        """
+        if hasattr(self, 'zobrist'):
+            # the hash pair of -board is the pair swapped
+            return boardHash if player == 1 else boardHash[::-1]
+
+
+def symmetryPermutations(getSymmetries, boardShape, actionSize):
+    """
+    Runs getSymmetries, a function of (board, pi) that only moves values
+    around and returns the same number of forms for every board, on a board
+    holding the indices of its cells and on the indices of the actions.
+    Games call it once, to build the tables of getSymmetryPermutations.
+
+    Returns:
+        boardPerms, piPerms: as returned by Game.getSymmetryPermutations
+    """
+    symmetries = getSymmetries(np.arange(np.prod(boardShape)).reshape(boardShape), np.arange(actionSize))
+    boardPerms = np.array([np.ravel(symBoard) for symBoard, _ in symmetries])
+    piPerms = np.array([perm for _, perm in symmetries])
+    return boardPerms, piPerms
@@ -0,0 +1,131 @@
+import logging
+import queue
+import time
+
+from NeuralNet import NeuralNet
+from utils import getSpawnContext
+
+log = logging.getLogger(__name__)
+
+
+class InferenceServer():
+    """
+    Runs a neural network in its own process for the self-play workers. The
+    workers send their boards through one request queue and each gets its
+    answers on its own reply queue. The server evaluates the boards of
+    several requests in one predict_batch call: it takes requests until it
+    has maxBatch boards, or until maxWait seconds have passed since the first
+    one arrived.
+
+    Hand one of the clients to each worker process. They are NeuralNets, so
+    MCTS uses them as it would the network. The loader loads checkpoints into
+    the server, from this process or from the one it is handed to.
+    """
+
+    def __init__(self, game, nnetClass, numClients, maxBatch=64, maxWait=0.002):
+        context = getSpawnContext()
+        self.requests = context.Queue()
+        # one reply queue per client, and the last one to acknowledge load_checkpoint
+        self.replies = [context.Queue() for _ in range(numClients + 1)]
+        self.clients = [InferenceClient(i, self.requests, self.replies[i]) for i in range(numClients)]
+        self.loader = InferenceLoader(numClients, self.requests, self.replies[-1])
+        self.process = context.Process(target=serve, daemon=True,
+                                       args=(game, nnetClass, self.requests, self.replies, maxBatch, maxWait))
+        self.process.start()
+
+    def load_checkpoint(self, folder='checkpoint', filename='checkpoint.pth.tar'):
+        """
+        Loads the server's network. Returns once it is loaded, so every
+        request sent afterwards is evaluated with the new weights.
+        """
+        self.loader.load_checkpoint(folder, filename)
+
+    def stop(self):
+        self.requests.put(('stop', None, None))
+        self.process.join()
+
+
+class InferenceClient(NeuralNet):
+    """
+    Sends boards to an InferenceServer and waits for its answer. Only
+    predict and predict_batch are supported, the server owns the weights.
+    """
+
+    def __init__(self, clientId, requests, replies):
+        self.clientId = clientId
+        self.requests = requests
+        self.replies = replies
+
+    def predict(self, board):
+        pis, vs = self.predict_batch([board])
+        return pis[0], vs[0]
+
+    def predict_batch(self, boards):
+        self.requests.put(('predict', self.clientId, list(boards)))
+        return self.replies.get()
+
+    def load_checkpoint(self, folder='checkpoint', filename='checkpoint.pth.tar'):
+        """
+        Does nothing: see InferenceServer.load_checkpoint.
+        """
+        pass
+
+
+class InferenceLoader():
+    """
+    Has an InferenceServer load checkpoints, see
+    InferenceServer.load_checkpoint. It can be passed to another process,
+    but only one process may use it at a time.
+    """
+
+    def __init__(self, clientId, requests, replies):
+        self.clientId = clientId
+        self.requests = requests
+        self.replies = replies
+
+    def load_checkpoint(self, folder='checkpoint', filename='checkpoint.pth.tar'):
+        self.requests.put(('load', self.clientId, (folder, filename)))
+        self.replies.get()
+
+
+def serve(game, nnetClass, requests, replies, maxBatch, maxWait):
+    """
+    The loop of the server process. Requests are (kind, clientId, payload)
+    tuples, where kind is 'predict' (payload: a list of boards), 'load'
+    (payload: the folder and filename of a checkpoint) or 'stop'.
+    """
+    nnet = nnetClass(game)
+    batches = boards = 0
+    while True:
+        kind, clientId, payload = requests.get()
+        batch = []  # the (clientId, boards) of the requests evaluated together
+        size = 0
+        deadline = time.monotonic() + maxWait
+        while kind == 'predict':
+            batch.append((clientId, payload))
+            size += len(payload)
+            if size >= maxBatch:
+                kind = None
+                break
+            try:
+                kind, clientId, payload = requests.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                kind = None
+
+        if batch:
+            pis, vs = nnet.predict_batch([board for _, clientBoards in batch for board in clientBoards])
+            start = 0
+            for client, clientBoards in batch:
+                end = start + len(clientBoards)
+                replies[client].put((pis[start:end], vs[start:end]))
+                start = end
+            batches += 1
+            boards += size
+
+        if kind == 'load':
+            nnet.load_checkpoint(*payload)
+            replies[clientId].put(True)
+        elif kind == 'stop':
+            if batches:
+                log.info(f'Inference server evaluated {boards} boards in {batches} batches')
+            return
@@ -17,28 +17,46 @@ class MCTS():
         self.game = game
         self.nnet = nnet
         self.args = args
-        self.Qsa = {}  # stores Q values for s,a (as defined in the paper)
-        self.Nsa = {}  # stores #times edge s,a was visited
+        self.Qsa = {}  # stores Q values for s,a (as defined in the paper), as Qsa[s][a]
+        self.Nsa = {}  # stores #times edge s,a was visited, as Nsa[s][a]
         self.Ns = {}  # stores #times board s was visited
         self.Ps = {}  # stores initial policy (returned by neural net)
 
         self.Es = {}  # stores game.getGameEnded ended for board s
         self.Vs = {}  # stores game.getValidMoves for board s
 
+        # with symmetryKeys, every board is replaced by the representative of its symmetry class
+        self.symmetryKeys = getattr(args, 'symmetryKeys', False)
+        self.Rs = {}  # stores the representative of board s and its string, with symmetryKeys
+        # states are keyed by game.getBoardHash rather than stringRepresentation when the game implements it
+        self.hashKeys = (getattr(args, 'boardHashKeys', True) and not self.symmetryKeys
+                         and game.getBoardHash(game.getInitBoard()) is not None)
+
     def getActionProb(self, canonicalBoard, temp=1):
         """
         This function performs numMCTSSims simulations of MCTS starting from
         canonicalBoard.
 
+        With args.symmetryKeys, the search runs on the representative of the
+        symmetry class of canonicalBoard (see Game.getSymmetryCanonicalForm),
+        and the visit counts are mapped back to the actions of canonicalBoard.
+        args.symmetryKeys turns off the board hash keys.
+
         Returns:
             probs: a policy vector where the probability of the ith action is
                    proportional to Nsa[(s,a)]**(1./temp)
         """
+        if self.symmetryKeys:
+            canonicalBoard, perm = self.game.getSymmetryCanonicalForm(canonicalBoard)
+
+        boardHash = self.game.getBoardHash(canonicalBoard) if self.hashKeys else None
         for i in range(self.args.numMCTSSims):
-            self.search(canonicalBoard)
+            self.search(canonicalBoard, boardHash)
 
-        s = self.game.stringRepresentation(canonicalBoard)
-        counts = [self.Nsa[(s, a)] if (s, a) in self.Nsa else 0 for a in range(self.game.getActionSize())]
+        s = boardHash if self.hashKeys else self.game.stringRepresentation(canonicalBoard)
+        counts = self.Nsa[s].tolist() if s in self.Nsa else [0] * self.game.getActionSize()
+        if self.symmetryKeys:
+            counts = mapPolicy(counts, perm).tolist()
 
         if temp == 0:
             bestAs = np.array(np.argwhere(counts == np.max(counts))).flatten()
@@ -52,17 +70,27 @@ class MCTS():
         probs = [x / counts_sum for x in counts]
         return probs
 
-    def search(self, canonicalBoard):
+    def search(self, canonicalBoard, boardHash=None):
         """
-        This function performs one iteration of MCTS. It is recursively called
-        till a leaf node is found. The action chosen at each node is one that
-        has the maximum upper confidence bound as in the paper.
+        This function performs one iteration of MCTS. The tree is descended
+        from canonicalBoard till a leaf node is found, recording the (s, a)
+        edges taken in a path buffer. The action chosen at each node is one
+        that has the maximum upper confidence bound as in the paper.
 
         Once a leaf node is found, the neural network is called to return an
         initial policy P and a value v for the state. This value is propagated
-        up the search path. In case the leaf node is a terminal state, the
-        outcome is propagated up the search path. The values of Ns, Nsa, Qsa are
-        updated.
+        up the search path by walking the path buffer backwards. In case the
+        leaf node is a terminal state, the outcome is propagated up the search
+        path. The values of Ns, Nsa, Qsa are updated.
+
+        The search is a loop rather than a recursion, so long games do not
+        build deep Python call stacks. It updates the statistics exactly as
+        calling search recursively on each next state would.
+
+        If the game implements getBoardHash, states are keyed by their board
+        hash, which getNextStateHash updates along the path, instead of their
+        stringRepresentation. boardHash is the hash of canonicalBoard,
+        computed if not given.
 
         NOTE: the return values are the negative of the value of the current
         state. This is done since v is in [-1,1] and if v is the value of a
@@ -71,66 +99,169 @@ class MCTS():
         Returns:
             v: the negative of the value of the current canonicalBoard
         """
-
-        s = self.game.stringRepresentation(canonicalBoard)
-
-        if s not in self.Es:
-            self.Es[s] = self.game.getGameEnded(canonicalBoard, 1)
-        if self.Es[s] != 0:
-            # terminal node
-            return -self.Es[s]
-
-        if s not in self.Ps:
-            # leaf node
-            self.Ps[s], v = self.nnet.predict(canonicalBoard)
-            valids = self.game.getValidMoves(canonicalBoard, 1)
-            self.Ps[s] = self.Ps[s] * valids  # masking invalid moves
-            sum_Ps_s = np.sum(self.Ps[s])
-            if sum_Ps_s > 0:
-                self.Ps[s] /= sum_Ps_s  # renormalize
+        if self.hashKeys and boardHash is None:
+            boardHash = self.game.getBoardHash(canonicalBoard)
+        path = []  # the (s, a) edges taken from canonicalBoard to the leaf
+        while True:
+            if self.hashKeys:
+                s = boardHash
             else:
-                # if all valid moves were masked make all valid moves equally probable
-
-                # NB! All valid moves may be masked if either your NNet architecture is insufficient or you've get overfitting or something else.
-                # If you have got dozens or hundreds of these messages you should pay attention to your NNet and/or training process.   
-                log.error("All valid moves were masked, doing a workaround.")
-                self.Ps[s] = self.Ps[s] + valids
-                self.Ps[s] /= np.sum(self.Ps[s])
-
-            self.Vs[s] = valids
-            self.Ns[s] = 0
-            return -v
-
-        valids = self.Vs[s]
-        cur_best = -float('inf')
-        best_act = -1
-
-        # pick the action with the highest upper confidence bound
-        for a in range(self.game.getActionSize()):
-            if valids[a]:
-                if (s, a) in self.Qsa:
-                    u = self.Qsa[(s, a)] + self.args.cpuct * self.Ps[s][a] * math.sqrt(self.Ns[s]) / (
-                            1 + self.Nsa[(s, a)])
+                s = self.game.stringRepresentation(canonicalBoard)
+                if self.symmetryKeys:
+                    canonicalBoard, s = self.getRepresentative(s, canonicalBoard)
+
+            if s not in self.Es:
+                self.Es[s] = self.game.getGameEnded(canonicalBoard, 1)
+            if self.Es[s] != 0:
+                # terminal node
+                v = -self.Es[s]
+                break
+
+            if s not in self.Ps:
+                # leaf node
+                self.Ps[s], v = self.nnet.predict(canonicalBoard)
+                valids = self.game.getValidMoves(canonicalBoard, 1)
+                self.Ps[s] = self.Ps[s] * valids  # masking invalid moves
+                sum_Ps_s = np.sum(self.Ps[s])
+                if sum_Ps_s > 0:
+                    self.Ps[s] /= sum_Ps_s  # renormalize
                 else:
-                    u = self.args.cpuct * self.Ps[s][a] * math.sqrt(self.Ns[s] + EPS)  # Q = 0 ?
+                    # if all valid moves were masked make all valid moves equally probable
+
+                    # NB! All valid moves may be masked if either your NNet architecture is insufficient or you've get overfitting or something else.
+                    # If you have got dozens or hundreds of these messages you should pay attention to your NNet and/or training process.   
+                    log.error("All valid moves were masked, doing a workaround.")
+                    self.Ps[s] = self.Ps[s] + valids
+                    self.Ps[s] /= np.sum(self.Ps[s])
 
-                if u > cur_best:
-                    cur_best = u
-                    best_act = a
+                self.Vs[s] = valids
+                self.Ns[s] = 0
+                self.Qsa[s] = np.zeros(self.game.getActionSize())
+                self.Nsa[s] = np.zeros(self.game.getActionSize(), dtype=np.int64)
+                v = -np.ravel(v)[0]  # wrappers return v as a scalar or a length 1 array
+                break
 
-        a = best_act
-        next_s, next_player = self.game.getNextState(canonicalBoard, 1, a)
-        next_s = self.game.getCanonicalForm(next_s, next_player)
+            # pick the action with the highest upper confidence bound
+            a = bestUCBAction(self.Qsa[s], self.Nsa[s], self.Ps[s], self.Ns[s], self.Vs[s], self.args.cpuct)
+            path.append((s, a))
+            if self.hashKeys:
+                next_s, next_player, boardHash = self.game.getNextStateHash(canonicalBoard, 1, a, boardHash)
+                boardHash = self.game.getCanonicalHash(boardHash, next_player)
+            else:
+                next_s, next_player = self.game.getNextState(canonicalBoard, 1, a)
+            canonicalBoard = self.game.getCanonicalForm(next_s, next_player)
 
-        v = self.search(next_s)
+        for s, a in reversed(path):
+            # running mean, so an edge visited for the first time gets Q = v
+            self.Qsa[s][a] = (self.Nsa[s][a] * self.Qsa[s][a] + v) / (self.Nsa[s][a] + 1)
+            self.Nsa[s][a] += 1
 
-        if (s, a) in self.Qsa:
-            self.Qsa[(s, a)] = (self.Nsa[(s, a)] * self.Qsa[(s, a)] + v) / (self.Nsa[(s, a)] + 1)
-            self.Nsa[(s, a)] += 1
+            self.Ns[s] += 1
+            v = -v
+        return v
 
+    def getRepresentative(self, s, canonicalBoard):
+        """
+        Returns the representative of the symmetry class of canonicalBoard,
+        whose string representation is s, and the representative's string
+        representation. Remembered in Rs, since the search visits the same
+        boards over and over.
+        """
+        if s not in self.Rs:
+            symBoard, _ = self.game.getSymmetryCanonicalForm(canonicalBoard)
+            self.Rs[s] = (symBoard, self.game.stringRepresentation(symBoard))
+        return self.Rs[s]
+
+    def reroot(self, canonicalBoard):
+        """
+        Makes canonicalBoard the root of the tree, to be called once a move
+        has been played. The states reachable from it through visited edges
+        keep their statistics, so the subtree searched so far carries over to
+        the next getActionProb. The statistics of every other state are
+        released. If canonicalBoard was never searched, everything is
+        released.
+        """
+        if self.symmetryKeys:
+            canonicalBoard, _ = self.game.getSymmetryCanonicalForm(canonicalBoard)
+        if self.hashKeys:
+            s = self.game.getBoardHash(canonicalBoard)
         else:
-            self.Qsa[(s, a)] = v
-            self.Nsa[(s, a)] = 1
+            s = self.game.stringRepresentation(canonicalBoard)
+        reachable = set()
+        if s in self.Es:
+            reachable.add(s)
+            stack = [(s, canonicalBoard)]
+            while stack:
+                s, board = stack.pop()
+                if s not in self.Nsa:
+                    continue
+                for a in np.flatnonzero(self.Nsa[s]):
+                    if self.hashKeys:
+                        next_s, next_player, next_key = self.game.getNextStateHash(board, 1, a, s)
+                        next_key = self.game.getCanonicalHash(next_key, next_player)
+                        next_s = self.game.getCanonicalForm(next_s, next_player)
+                    else:
+                        next_s, next_player = self.game.getNextState(board, 1, a)
+                        next_s = self.game.getCanonicalForm(next_s, next_player)
+                        if self.symmetryKeys:
+                            next_s, _ = self.game.getSymmetryCanonicalForm(next_s)
+                        next_key = self.game.stringRepresentation(next_s)
+                    if next_key not in reachable:
+                        reachable.add(next_key)
+                        stack.append((next_key, next_s))
+
+        self.Qsa = {s: q for s, q in self.Qsa.items() if s in reachable}
+        self.Nsa = {s: n for s, n in self.Nsa.items() if s in reachable}
+        self.Ns = {s: n for s, n in self.Ns.items() if s in reachable}
+        self.Ps = {s: p for s, p in self.Ps.items() if s in reachable}
+        self.Es = {s: e for s, e in self.Es.items() if s in reachable}
+        self.Vs = {s: v for s, v in self.Vs.items() if s in reachable}
+        self.Rs = {}
+
+
+def bestUCBAction(qsa, nsa, ps, ns, valids, cpuct):
+    """
+    Computes the upper confidence bound of every action of a node in one
+    numpy expression and returns the valid action where it is highest. Edges
+    that were never visited (nsa == 0) are scored with Q = 0. Ties go to the
+    lowest action index, as np.argmax returns the first maximum.
+
+    Input:
+        qsa, nsa, ps: arrays of length game.getActionSize() with the Q values,
+                      visit counts and prior policy of the node's edges
+        ns: #times the node was visited
+        valids: game.getValidMoves for the node
+        cpuct: the exploration constant
+    """
+    u = np.where(nsa > 0,
+                 qsa + cpuct * ps * math.sqrt(ns) / (1 + nsa),
+                 cpuct * ps * math.sqrt(ns + EPS))  # Q = 0 ?
+    u[np.logical_not(valids)] = -np.inf
+    return int(np.argmax(u))
 
-        self.Ns[s] += 1
-        return -v
+
+def mapPolicy(pi, perm):
+    """
+    Maps a policy (or visit counts) of the symmetrical board returned by
+    Game.getSymmetryCanonicalForm back to the actions of the original board.
+    """
+    pi = np.asarray(pi)
+    newPi = np.empty_like(pi)
+    newPi[perm] = pi
+    return newPi
+
+
+def createMCTS(game, nnet, args):
+    """
+    Returns the MCTS engine selected by args.mctsEngine: 'dict' (the default)
+    for MCTS, or 'array' for ArrayMCTS.
+    """
+    engine = getattr(args, 'mctsEngine', 'dict')
+    if engine == 'array':
+        from ArrayMCTS import ArrayMCTS
+        return ArrayMCTS(game, nnet, args)
+    if engine != 'dict':
+        raise ValueError(f'Unknown mctsEngine {engine!r}')
+    if getattr(args, 'mctsBatchSize', 1) > 1:
+        raise ValueError("mctsBatchSize > 1 needs mctsEngine = 'array'")
+    return MCTS(game, nnet, args)
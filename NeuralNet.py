@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class NeuralNet():
     """
     This class specifies the base NeuralNet class. To define your own neural
@@ -36,6 +39,24 @@ class NeuralNet():
         """
         pass
 
+    def predict_batch(self, boards):
+        """
+        Input:
+            boards: a list of boards in their canonical form.
+
+        Returns:
+            pis: an array with the policy vector of each board, of shape
+                 (len(boards), game.getActionSize())
+            vs: an array with the value of each board, of length len(boards)
+
+        This is what the batched searches, arenas and the inference server
+        call, so implement it to evaluate the boards in one batch, and
+        predict as a batch of one board. The default calls predict on each
+        board in turn, for networks that only implement predict.
+        """
+        pis, vs = zip(*[self.predict(board) for board in boards])
+        return np.array(pis), np.array(vs).reshape(-1)
+
     def save_checkpoint(self, folder, filename):
         """
         Saves the current neural network (with its parameters) in
@@ -0,0 +1,145 @@
+import logging
+
+import numpy as np
+from tqdm import tqdm
+
+from Arena import Arena, sprtDecision
+from CachedNNet import CachedNNet
+from MCTS import createMCTS
+from utils import getSpawnContext
+
+log = logging.getLogger(__name__)
+
+
+class ParallelArena():
+    """
+    Plays the games of Arena.playGames in a pool of worker processes.
+
+    A player function usually holds a live MCTS and network, which can't be
+    sent to another process, so ParallelArena takes player factories
+    instead: picklable callables that take the game and return a player
+    function (see MCTSPlayerFactory). Every worker gets a copy of the
+    factories, and each game is played by two new players built from them.
+    """
+
+    def __init__(self, playerFactory1, playerFactory2, game, numWorkers):
+        """
+        Input:
+            playerFactory 1,2: picklable callables that take a Game and return
+                               a player, a function that takes board as input
+                               and returns action
+            game: Game object
+            numWorkers: number of processes playing games
+        """
+        self.playerFactory1 = playerFactory1
+        self.playerFactory2 = playerFactory2
+        self.game = game
+        self.numWorkers = numWorkers
+
+    def playGames(self, num, sprt=None):
+        """
+        Plays num games in which player1 starts num/2 games and player2 starts
+        num/2 games, like Arena.playGames. Every game is given its own seed,
+        drawn from np.random, so a seeded run can be repeated whatever the
+        order the workers finish in.
+
+        With sprt, as in Arena.playGames, the games are handed out with
+        player1 and player2 starting in turn, and the games still running are
+        dropped as soon as the test decides. The results are counted in the
+        order the games were handed out, as Arena.playGames plays them, so
+        the test stops at the same game whatever the order the workers
+        finish in.
+
+        Returns:
+            oneWon: games won by player1
+            twoWon: games won by player2
+            draws:  games won by nobody
+        """
+        num = int(num / 2)
+        seeds = np.random.randint(2 ** 31, size=2 * num)
+        if sprt is None:
+            tasks = [(i >= num, int(seed)) for i, seed in enumerate(seeds)]
+        else:
+            # player1 and player2 start in turn, so that stopping early keeps the starts even
+            tasks = [(i % 2 == 1, int(seed)) for i, seed in enumerate(seeds)]
+
+        oneWon = 0
+        twoWon = 0
+        draws = 0
+        context = getSpawnContext()
+        with context.Pool(self.numWorkers, initializer=initArenaWorker,
+                          initargs=(self.playerFactory1, self.playerFactory2, self.game)) as pool:
+            # imap holds back the results of the games that end before those handed out earlier
+            results = pool.imap_unordered(playArenaGame, tasks) if sprt is None else pool.imap(playArenaGame, tasks)
+            for gameResult in tqdm(results, total=len(tasks), desc="Arena.playGames"):
+                if gameResult == 1:
+                    oneWon += 1
+                elif gameResult == -1:
+                    twoWon += 1
+                else:
+                    draws += 1
+                if sprt is not None and sprtDecision(twoWon, oneWon, *sprt) is not None:
+                    break
+
+        return oneWon, twoWon, draws
+
+
+class MCTSPlayerFactory():
+    """
+    Builds players that play the most visited action of an MCTS, like
+    Coach.getArenaPlayer, over a network loaded from a checkpoint. The
+    network is loaded by the first call, in the worker process, and shared
+    by the players built after it. Each player has its own search tree.
+    """
+
+    def __init__(self, nnetClass, folder, filename, args):
+        self.nnetClass = nnetClass
+        self.folder = folder
+        self.filename = filename
+        self.args = args
+        self.nnet = None
+
+    def __call__(self, game):
+        if self.nnet is None:
+            self.nnet = self.nnetClass(game)
+            self.nnet.load_checkpoint(folder=self.folder, filename=self.filename)
+            if getattr(self.args, 'evalCacheSize', 0) > 0:
+                self.nnet = CachedNNet(game, self.nnet, self.args.evalCacheSize,
+                                       getattr(self.args, 'symmetryKeys', False))
+        mcts = createMCTS(game, self.nnet, self.args)
+        reuseTree = getattr(self.args, 'reuseTree', False)
+
+        def play(canonicalBoard):
+            if reuseTree:
+                mcts.reroot(canonicalBoard)
+            return np.argmax(mcts.getActionProb(canonicalBoard, temp=0))
+
+        return play
+
+    def __getstate__(self):
+        # the network stays in the process that loaded it
+        state = self.__dict__.copy()
+        state['nnet'] = None
+        return state
+
+
+factories = None  # the (playerFactory1, playerFactory2, game) of a worker process
+
+
+def initArenaWorker(playerFactory1, playerFactory2, game):
+    global factories
+    factories = (playerFactory1, playerFactory2, game)
+
+
+def playArenaGame(task):
+    """
+    Plays one game of ParallelArena.playGames. Returns its result for
+    player1: 1 if it won, -1 if it lost, the game's draw value otherwise.
+    """
+    swapped, seed = task
+    playerFactory1, playerFactory2, game = factories
+    np.random.seed(seed)
+    player1, player2 = playerFactory1(game), playerFactory2(game)
+    if not swapped:
+        return Arena(player1, player2, game).playGame()
+    return -Arena(player2, player1, game).playGame()
@@ -0,0 +1,150 @@
+import glob
+import logging
+import os
+import re
+import shutil
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class ReplayBuffer():
+    """
+    Keeps the training examples on disk, one shard per self-play iteration.
+    A shard is three .npy files in folder, holding the boards, policies and
+    values of its examples, and is never rewritten once saved. Shards are
+    numbered in the order they are added, after the highest number found in
+    folder, so a shard on disk is never overwritten. Adding a shard beyond
+    maxShards deletes the oldest one. A buffer that didn't load the shards
+    of its folder starts afresh: the shards left there by another run are
+    deleted by its first addShard, or by a load from another folder.
+
+    The shards are opened memory-mapped, so an example is only read from
+    disk when it is used. A ReplayBuffer behaves like the list of
+    (board, pi, v) examples passed to NeuralNet.train: it supports len and
+    indexing, and iterates over all the examples, oldest first.
+
+    Boards are stored as numpy arrays, so games whose boards are other
+    objects (Tafl) can't use it.
+    """
+
+    def __init__(self, folder, maxShards):
+        self.folder = folder
+        self.maxShards = maxShards
+        self.shards = []  # the (number, boards, pis, vs) of every shard, oldest first
+        self.lastShard = max(self.getShardNumbers(folder), default=0)  # the highest shard number in folder
+        self.started = False  # whether shards were added or loaded
+        self.offsets = np.zeros(1, dtype=np.int64)  # the index of the first example of every shard, and the total
+
+    def addShard(self, examples):
+        """
+        Saves the (board, pi, v) examples as a new shard, numbered after the
+        newest one.
+        """
+        boards, pis, vs = zip(*examples)
+        if not isinstance(boards[0], np.ndarray):
+            raise ValueError(f'ReplayBuffer needs boards that are numpy arrays, not {type(boards[0]).__name__}')
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        if not self.started:
+            self.removeStaleShards()
+            self.started = True
+        self.lastShard += 1
+        arrays = {'boards': np.asarray(boards),
+                  'pis': np.asarray(pis, dtype=np.float32),
+                  'vs': np.asarray(vs, dtype=np.float32)}
+        for name, array in arrays.items():
+            filename = self.getShardFile(self.lastShard, name)
+            # written aside and renamed, so a crash never leaves half a shard
+            with open(filename + '.tmp', 'wb') as f:
+                np.save(f, array)
+            os.replace(filename + '.tmp', filename)
+
+        self.shards.append(self.openShard(self.lastShard))
+        while len(self.shards) > self.maxShards:
+            oldest = self.shards.pop(0)[0]
+            log.warning(f'Removing the oldest shard of the replay buffer (shard {oldest})')
+            for name in ['boards', 'pis', 'vs']:
+                os.remove(self.getShardFile(oldest, name))
+        self.updateOffsets()
+
+    def load(self, folder=None):
+        """
+        Opens the newest maxShards shards found in folder, by default the
+        folder of the buffer. The shards of another folder are copied into
+        the folder of the buffer first, so that the buffer never adds to or
+        deletes from the folder it was loaded from.
+        """
+        folder = folder or self.folder
+        numbers = self.getShardNumbers(folder)[-self.maxShards:]
+        if os.path.abspath(folder) != os.path.abspath(self.folder):
+            if not os.path.exists(self.folder):
+                os.makedirs(self.folder)
+            self.removeStaleShards()
+            for number in numbers:
+                for name in ['boards', 'pis', 'vs']:
+                    filename = os.path.basename(self.getShardFile(number, name))
+                    shutil.copyfile(os.path.join(folder, filename), os.path.join(self.folder, filename))
+        self.shards = [self.openShard(number) for number in numbers]
+        self.lastShard = max(self.getShardNumbers(self.folder), default=0)
+        self.started = True
+        self.updateOffsets()
+
+    def removeStaleShards(self):
+        """
+        Deletes the shards left in the folder of the buffer by another run.
+        """
+        stale = self.getShardNumbers(self.folder)
+        if stale:
+            log.warning(f'Removing the {len(stale)} shards left in {self.folder} by another run')
+        for number in stale:
+            for name in ['boards', 'pis', 'vs']:
+                os.remove(self.getShardFile(number, name))
+
+    @staticmethod
+    def getShardNumbers(folder):
+        """
+        Returns the numbers of the shards saved in folder, in order.
+        """
+        return sorted(int(re.search(r'shard_(\d+)_vs\.npy$', filename).group(1))
+                      for filename in glob.glob(os.path.join(folder, 'shard_*_vs.npy')))
+
+    def openShard(self, number):
+        return (number,) + tuple(np.load(self.getShardFile(number, name), mmap_mode='r')
+                                 for name in ['boards', 'pis', 'vs'])
+
+    def updateOffsets(self):
+        self.offsets = np.cumsum([0] + [len(shard[3]) for shard in self.shards])
+
+    def getShardFile(self, number, name):
+        return os.path.join(self.folder, f'shard_{number:05d}_{name}.npy')
+
+    def getBatch(self, ids):
+        """
+        Returns the boards, pis and vs of the examples ids as arrays, reading
+        each shard once.
+        """
+        ids = np.asarray(ids) % len(self)
+        shards = np.searchsorted(self.offsets, ids, side='right') - 1
+        _, boards, pis, vs = self.shards[shards[0]]
+        batch = [np.empty((len(ids),) + array.shape[1:], dtype=array.dtype) for array in (boards, pis, vs)]
+        for shard in np.unique(shards):
+            rows = np.flatnonzero(shards == shard)
+            j = ids[rows] - self.offsets[shard]
+            for array, out in zip(self.shards[shard][1:], batch):
+                out[rows] = array[j]
+        return tuple(batch)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('ReplayBuffer index out of range')
+        shard = np.searchsorted(self.offsets, i, side='right') - 1
+        _, boards, pis, vs = self.shards[shard]
+        j = i - self.offsets[shard]
+        return boards[j], pis[j], vs[j]
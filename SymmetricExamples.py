@@ -0,0 +1,42 @@
+import numpy as np
+
+
+class SymmetricExamples():
+    """
+    Wraps training examples stored once per position, without their
+    symmetrical forms, and applies a random symmetry of the game to each
+    example as it is read. Every read draws a new symmetry, so over the
+    epochs the network sees all the forms that getSymmetries would have
+    stored, with a fraction of the memory.
+
+    The symmetries are the index permutations of
+    Game.getSymmetryPermutations. getBatch applies them to a whole batch
+    with one fancy index per array.
+    """
+
+    def __init__(self, game, examples):
+        self.examples = examples  # a list of (board, pi, v) or a ReplayBuffer
+        self.boardPerms, self.piPerms = game.getSymmetryPermutations()
+
+    def __len__(self):
+        return len(self.examples)
+
+    def __getitem__(self, i):
+        board, pi, v = self.examples[i]
+        k = np.random.randint(len(self.boardPerms))
+        board = np.asarray(board)
+        return np.ravel(board)[self.boardPerms[k]].reshape(board.shape), np.asarray(pi)[self.piPerms[k]], v
+
+    def getBatch(self, ids):
+        """
+        Returns the boards, pis and vs of the examples ids as arrays, each
+        example under its own random symmetry.
+        """
+        if hasattr(self.examples, 'getBatch'):
+            boards, pis, vs = self.examples.getBatch(ids)
+        else:
+            boards, pis, vs = (np.asarray(x) for x in zip(*[self.examples[i] for i in ids]))
+        k = np.random.randint(len(self.boardPerms), size=len(ids))
+        rows = np.arange(len(ids))[:, None]
+        boards = boards.reshape(len(ids), -1)[rows, self.boardPerms[k]].reshape(boards.shape)
+        return boards, pis[rows, self.piPerms[k]], vs
@@ -0,0 +1,51 @@
+import numpy as np
+
+
+class ZobristHash():
+    """
+    Random 64 bit keys for Zobrist hashing: the hash of a board is the XOR of
+    the keys of the (square, value) pairs on it, so a move updates it with a
+    few XORs instead of hashing the whole board again. Empty squares (value
+    0) have no key.
+
+    Games whose canonical form negates the board keep a pair (h, hNeg), the
+    hashes of board and -board, so that getCanonicalForm just swaps them. See
+    hashPair and updatePair.
+
+    The keys come from a RandomState seeded with seed, so every process that
+    builds the same ZobristHash gets the same hashes.
+    """
+
+    def __init__(self, numSquares, values=(-1, 1), seed=0):
+        rng = np.random.RandomState(seed)
+        keys = rng.randint(0, 2 ** 64, size=(len(values), numSquares), dtype=np.uint64)
+        self.arrays = dict(zip(values, keys))  # value -> the keys of all the squares, for hashBoard
+        # python ints XOR faster than numpy scalars
+        self.keys = [{0: 0} for _ in range(numSquares)]  # square -> value -> key
+        for value, row in self.arrays.items():
+            for square, key in enumerate(row.tolist()):
+                self.keys[square][value] = key
+
+    def hashBoard(self, board):
+        """
+        Returns the hash of board, an array with one value per square.
+        """
+        board = np.ravel(board)
+        h = 0
+        for value, keys in self.arrays.items():
+            h ^= int(np.bitwise_xor.reduce(keys[board == value]))
+        return h
+
+    def hashPair(self, board):
+        """
+        Returns (h, hNeg), the hashes of board and -board.
+        """
+        return self.hashBoard(board), self.hashBoard(-np.asarray(board))
+
+    def updatePair(self, boardHash, square, old, new):
+        """
+        Returns the hashPair of the board after square changed from old to new.
+        """
+        h, hNeg = boardHash
+        keys = self.keys[square]
+        return h ^ keys[old] ^ keys[new], hNeg ^ keys[-old] ^ keys[-new]
@@ -0,0 +1,317 @@
+"""
+Benchmarks for the code around the neural network. The network is replaced
+by a stand-in that returns random numbers, so that the timings measure the
+search and not the network.
+
+use this script to measure MCTS simulations per second on the bundled games:
+
+    python benchmark.py mcts
+    python benchmark.py mcts --games othello8 tafl --engines dict array --sims 100
+
+or to count the neural net evaluations saved by args.symmetryKeys, over
+self-play episodes sharing an evaluation cache:
+
+    python benchmark.py symmetry --games othello8 tictactoe --episodes 20
+
+or to measure the latency of a call to the pytorch network of othello, against
+the conversions it used to make before the forward pass (float64 copy, eval()
+and no_grad on every call):
+
+    python benchmark.py predict --games othello6 --batches 1 8 64 --channels 512
+
+or to compare the int8 othello network (othello/pytorch/QuantizedNNet.py) to
+the float one it is quantized from: the policy KL divergence and value MSE
+on held-out boards, and the boards per second of each. The boards come from
+--examples, a Coach .examples file or replay folder, or else from random
+games; calibration and held-out boards don't overlap:
+
+    python benchmark.py quantize --checkpoint ./temp/ best.pth.tar --examples ./temp/replay/
+"""
+
+import argparse
+import logging
+import os
+import time
+from pickle import Unpickler
+
+import coloredlogs
+import numpy as np
+
+from CachedNNet import CachedNNet
+from MCTS import createMCTS
+from NeuralNet import NeuralNet
+from ReplayBuffer import ReplayBuffer
+from connect4.Connect4Game import Connect4Game
+from dotsandboxes.DotsAndBoxesGame import DotsAndBoxesGame
+from gobang.GobangGame import GobangGame
+from othello.OthelloGame import OthelloGame
+from rts.RTSGame import RTSGame
+from santorini.SantoriniGame import SantoriniGame
+from tafl.TaflGame import TaflGame
+from tictactoe.TicTacToeGame import TicTacToeGame
+from tictactoe_3d.TicTacToeGame import TicTacToeGame as TicTacToe3DGame
+from utils import *
+
+log = logging.getLogger(__name__)
+
+GAMES = {
+    'othello6': lambda: OthelloGame(6),
+    'othello8': lambda: OthelloGame(8),
+    'tictactoe': lambda: TicTacToeGame(3),
+    'tictactoe3d': lambda: TicTacToe3DGame(3),
+    'connect4': lambda: Connect4Game(),
+    'gobang': lambda: GobangGame(),
+    'tafl': lambda: TaflGame('Brandubh'),
+    'rts': lambda: RTSGame(),
+    'dotsandboxes': lambda: DotsAndBoxesGame(3),
+    'santorini': lambda: SantoriniGame(),
+}
+
+
+class RandomNNet(NeuralNet):
+    """
+    Stand-in for a neural network that returns a random policy and value.
+    """
+
+    def __init__(self, game):
+        self.action_size = game.getActionSize()
+        self.calls = 0
+
+    def predict(self, board):
+        self.calls += 1
+        return np.random.dirichlet(np.ones(self.action_size)), np.random.uniform(-1, 1)
+
+
+def benchmarkMCTS(game, engine, sims, moves, nnet=None, symmetryKeys=False):
+    """
+    Plays up to moves moves of game, sampling each move from the policy of
+    an MCTS with sims simulations. nnet defaults to a new RandomNNet.
+
+    Returns:
+        simsPerSec: simulations per second spent in getActionProb
+    """
+    args = dotdict({'numMCTSSims': sims, 'cpuct': 1.0, 'mctsEngine': engine, 'symmetryKeys': symmetryKeys})
+    mcts = createMCTS(game, nnet or RandomNNet(game), args)
+    board = game.getInitBoard()
+    curPlayer = 1
+    played = 0
+    elapsed = 0.
+    while played < moves and game.getGameEnded(board, curPlayer) == 0:
+        canonicalBoard = game.getCanonicalForm(board, curPlayer)
+        start = time.perf_counter()
+        pi = mcts.getActionProb(canonicalBoard, temp=1)
+        elapsed += time.perf_counter() - start
+        action = np.random.choice(len(pi), p=np.array(pi) / np.sum(pi))
+        board, curPlayer = game.getNextState(board, curPlayer, action)
+        played += 1
+    return played * sims / elapsed
+
+
+def runMCTS(args):
+    print(f'{"game":<14}' + ''.join(f'{engine + " sims/s":>16}' for engine in args.engines))
+    for name in args.games:
+        try:
+            game = GAMES[name]()
+        except Exception as e:
+            log.warning(f'Skipping {name}: {e!r}')
+            continue
+        results = []
+        for engine in args.engines:
+            np.random.seed(0)
+            results.append(benchmarkMCTS(game, engine, args.sims, args.moves))
+        print(f'{name:<14}' + ''.join(f'{r:>16.1f}' for r in results))
+
+
+def runSymmetry(args):
+    print(f'{"game":<14}{"evals":>10}{"sym evals":>10}{"sims/s":>10}{"sym sims/s":>12}')
+    for name in args.games:
+        try:
+            game = GAMES[name]()
+        except Exception as e:
+            log.warning(f'Skipping {name}: {e!r}')
+            continue
+        results = []
+        for symmetryKeys in [False, True]:
+            np.random.seed(0)
+            nnet = RandomNNet(game)
+            cached = CachedNNet(game, nnet, args.cacheSize, symmetries=symmetryKeys)
+            simsPerSec = [benchmarkMCTS(game, args.engine, args.sims, args.moves, cached, symmetryKeys)
+                          for _ in range(args.episodes)]
+            results += [nnet.calls, np.mean(simsPerSec)]
+        evals, simsPerSec, symEvals, symSimsPerSec = results
+        print(f'{name:<14}{evals:>10}{symEvals:>10}{simsPerSec:>10.1f}{symSimsPerSec:>12.1f}')
+
+
+def benchmarkPredict(nnet, boards, calls):
+    """
+    Returns the seconds per call of nnet.predict_batch(boards) (predict for
+    a single board), and of the conversions it used to make.
+    """
+    import torch  # only this benchmark needs pytorch
+
+    def legacy():
+        inputs = torch.FloatTensor(np.array(boards).astype(np.float64))
+        inputs = inputs.view(-1, nnet.board_x, nnet.board_y)
+        nnet.nnet.eval()
+        with torch.no_grad():
+            pi, v = nnet.nnet(inputs)
+        return torch.exp(pi).data.cpu().numpy(), v.data.cpu().numpy()[:, 0]
+
+    def current():
+        return nnet.predict(boards[0]) if len(boards) == 1 else nnet.predict_batch(boards)
+
+    results = []
+    for predict in [legacy, current]:
+        for _ in range(10):
+            predict()  # warm up
+        start = time.perf_counter()
+        for _ in range(calls):
+            predict()
+        results.append((time.perf_counter() - start) / calls)
+    return results
+
+
+def runPredict(args):
+    from othello.pytorch import NNet  # only this benchmark needs pytorch
+
+    NNet.args.num_channels = args.channels
+    NNet.args.cuda = False
+    print(f'{"game":<14}{"batch":>6}{"before us/call":>16}{"us/call":>10}{"us/board":>10}')
+    for name in args.games:
+        game = GAMES[name]()
+        nnet = NNet.NNetWrapper(game)
+        board = game.getInitBoard()
+        for batch in args.batches:
+            before, after = benchmarkPredict(nnet, [board] * batch, args.calls)
+            print(f'{name:<14}{batch:>6}{before * 1e6:>16.0f}{after * 1e6:>10.0f}{after * 1e6 / batch:>10.0f}')
+
+
+def loadBoards(filename):
+    """
+    Returns the boards of the examples in filename, a Coach .examples file
+    or a replay buffer folder.
+    """
+    if os.path.isdir(filename):
+        buffer = ReplayBuffer(filename, maxShards=len(os.listdir(filename)))  # every shard
+        buffer.load()
+        return [board for board, _, _ in buffer]
+    with open(filename, 'rb') as f:
+        history = Unpickler(f).load()
+    return [board for examples in history for board, _, _ in examples]
+
+
+def playRandomBoards(game, num):
+    """
+    Returns num canonical boards of games played with uniformly random moves.
+    """
+    boards = []
+    board, curPlayer = game.getInitBoard(), 1
+    while len(boards) < num:
+        if game.getGameEnded(board, curPlayer) != 0:
+            board, curPlayer = game.getInitBoard(), 1
+        boards.append(game.getCanonicalForm(board, curPlayer))
+        action = np.random.choice(np.flatnonzero(game.getValidMoves(board, curPlayer)))
+        board, curPlayer = game.getNextState(board, curPlayer, action)
+    return boards
+
+
+def compareQuantized(nnet, boards):
+    """
+    Compares the predictions of nnet, a calibrated QuantizedNNetWrapper, on
+    boards to those of its float network.
+
+    Returns:
+        kl: mean KL divergence of the int8 policy from the float one
+        mse: mean squared error of the int8 value
+        agreement: fraction of boards where both policies have the same best move
+    """
+    from othello.pytorch.NNet import NNetWrapper
+
+    pis, vs = nnet.predict_batch(boards)
+    floatPis, floatVs = NNetWrapper.predict_batch(nnet, boards)
+    kl = np.sum(floatPis * (np.log(floatPis + 1e-12) - np.log(pis + 1e-12)), axis=1).mean()
+    return kl, np.mean((vs - floatVs) ** 2), np.mean(np.argmax(pis, 1) == np.argmax(floatPis, 1))
+
+
+def runQuantize(args):
+    from othello.pytorch import NNet, QuantizedNNet  # only this benchmark needs pytorch
+
+    NNet.args.num_channels = args.channels
+    NNet.args.cuda = False
+    game = GAMES[args.game]()
+    nnet = QuantizedNNet.QuantizedNNetWrapper(game)
+    if args.checkpoint:
+        nnet.load_checkpoint(*args.checkpoint)
+    else:
+        log.warning('No --checkpoint, comparing the networks with random weights.')
+    np.random.seed(0)
+    if args.examples:
+        boards = loadBoards(args.examples)
+        np.random.shuffle(boards)
+    else:
+        boards = playRandomBoards(game, args.calibration + args.heldOut)
+    calibration, heldOut = boards[:args.calibration], boards[args.calibration:args.calibration + args.heldOut]
+    nnet.calibrate(calibration)
+
+    kl, mse, agreement = compareQuantized(nnet, heldOut)
+    print(f'{len(heldOut)} held-out boards: policy KL {kl:.2e}, value MSE {mse:.2e}, '
+          f'same best move {agreement:.1%}')
+    print(f'{"batch":>6}{"fp32 boards/s":>16}{"int8 boards/s":>16}{"speedup":>9}')
+    for batch in args.batches:
+        results = []
+        for predict in [super(QuantizedNNet.QuantizedNNetWrapper, nnet).predict_batch, nnet.predict_batch]:
+            for _ in range(5):
+                predict(heldOut[:batch])  # warm up
+            start = time.perf_counter()
+            for _ in range(args.calls):
+                predict(heldOut[:batch])
+            results.append(batch * args.calls / (time.perf_counter() - start))
+        print(f'{batch:>6}{results[0]:>16.0f}{results[1]:>16.0f}{results[1] / results[0]:>8.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    mcts = subparsers.add_parser('mcts', help='MCTS simulations per second')
+    mcts.add_argument('--games', nargs='+', choices=list(GAMES), default=list(GAMES))
+    mcts.add_argument('--engines', nargs='+', choices=['dict', 'array'], default=['dict', 'array'])
+    mcts.add_argument('--sims', type=int, default=50, help='numMCTSSims')
+    mcts.add_argument('--moves', type=int, default=8, help='moves to play per game')
+    mcts.set_defaults(run=runMCTS)
+
+    symmetry = subparsers.add_parser('symmetry', help='neural net evaluations with and without symmetryKeys')
+    symmetry.add_argument('--games', nargs='+', choices=list(GAMES),
+                          default=['othello6', 'othello8', 'tictactoe', 'gobang', 'dotsandboxes', 'tafl'])
+    symmetry.add_argument('--engine', choices=['dict', 'array'], default='dict')
+    symmetry.add_argument('--sims', type=int, default=50, help='numMCTSSims')
+    symmetry.add_argument('--moves', type=int, default=6, help='moves to play per game')
+    symmetry.add_argument('--episodes', type=int, default=10, help='games played with the same evaluation cache')
+    symmetry.add_argument('--cacheSize', type=int, default=100000, help='evalCacheSize')
+    symmetry.set_defaults(run=runSymmetry)
+
+    predict = subparsers.add_parser('predict', help='latency of the pytorch othello network')
+    predict.add_argument('--games', nargs='+', choices=['othello6', 'othello8'], default=['othello6', 'othello8'])
+    predict.add_argument('--batches', nargs='+', type=int, default=[1, 8, 64], help='boards per call')
+    predict.add_argument('--channels', type=int, default=128, help='num_channels of the network')
+    predict.add_argument('--calls', type=int, default=200, help='calls timed per measurement')
+    predict.set_defaults(run=runPredict)
+
+    quantize = subparsers.add_parser('quantize', help='accuracy and throughput of the int8 othello network')
+    quantize.add_argument('--game', choices=['othello6', 'othello8'], default='othello6')
+    quantize.add_argument('--checkpoint', nargs=2, metavar=('FOLDER', 'FILE'), help='network to quantize')
+    quantize.add_argument('--examples', help='Coach .examples file or replay folder of the boards')
+    quantize.add_argument('--calibration', type=int, default=512, help='boards to calibrate on')
+    quantize.add_argument('--heldOut', type=int, default=1024, help='boards to compare the networks on')
+    quantize.add_argument('--channels', type=int, default=512, help='num_channels of the network')
+    quantize.add_argument('--batches', nargs='+', type=int, default=[1, 8, 64], help='boards per call')
+    quantize.add_argument('--calls', type=int, default=50, help='calls timed per measurement')
+    quantize.set_defaults(run=runQuantize)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    coloredlogs.install(level='INFO')
+    main()
@@ -3,6 +3,7 @@ import numpy as np
 
 sys.path.append('..')
 from Game import Game
+from ZobristHash import ZobristHash
 from .Connect4Logic import Board
 
 
@@ -14,6 +15,7 @@ class Connect4Game(Game):
     def __init__(self, height=None, width=None, win_length=None, np_pieces=None):
         Game.__init__(self)
         self._base_board = Board(height, width, win_length, np_pieces)
+        self.zobrist = ZobristHash(self._base_board.height * self._base_board.width)
 
     def getInitBoard(self):
         return self._base_board.np_pieces
@@ -30,6 +32,13 @@ class Connect4Game(Game):
         b.add_stone(action, player)
         return b.np_pieces, -player
 
+    def getNextStateHash(self, board, player, action, boardHash):
+        """getNextState, updating the hash pair with the new stone."""
+        b = self._base_board.with_np_pieces(np_pieces=np.copy(board))
+        row = b.add_stone(action, player)
+        boardHash = self.zobrist.updatePair(boardHash, row * b.width + action, 0, player)
+        return b.np_pieces, -player, boardHash
+
     def getValidMoves(self, board, player):
         "Any zero value in top row in a valid move"
         return self._base_board.with_np_pieces(np_pieces=board).get_valid_moves()
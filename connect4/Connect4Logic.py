@@ -20,18 +20,19 @@ class Board():
         self.win_length = win_length or DEFAULT_WIN_LENGTH
 
         if np_pieces is None:
-            self.np_pieces = np.zeros([self.height, self.width], dtype=np.int)
+            self.np_pieces = np.zeros([self.height, self.width], dtype=int)
         else:
             self.np_pieces = np_pieces
             assert self.np_pieces.shape == (self.height, self.width)
 
     def add_stone(self, column, player):
-        "Create copy of board containing new stone."
+        "Create copy of board containing new stone. Returns the row the stone landed in."
         available_idx, = np.where(self.np_pieces[:, column] == 0)
         if len(available_idx) == 0:
             raise ValueError("Can't play column %s on board %s" % (column, self))
 
         self.np_pieces[available_idx[-1]][column] = player
+        return available_idx[-1]
 
     def get_valid_moves(self):
         "Any zero value in top row in a valid move"
@@ -2,13 +2,16 @@ import sys
 import numpy as np
 
 sys.path.append('..')
-from Game import Game
+from Game import Game, symmetryPermutations
 from .DotsAndBoxesLogic import Board
 
 
 class DotsAndBoxesGame(Game):
     def __init__(self, n=3):
         self.n = n
+        # mirror, rotational, see Game.getSymmetryPermutations
+        self.boardPerms, self.piPerms = symmetryPermutations(self._transformSymmetries, self.getBoardSize(),
+                                                             self.getActionSize())
 
     def getInitBoard(self):
         # return initial board (numpy board)
@@ -65,7 +68,7 @@ class DotsAndBoxesGame(Game):
             board[1, -1] = aux
         return board
 
-    def getSymmetries(self, board, pi):
+    def _transformSymmetries(self, board, pi):
         # mirror, rotational
 
         horizontal = np.copy(board[:self.n+1, :self.n])
@@ -2,7 +2,7 @@ import numpy as np
 import sys
 import os
 sys.path.append('..')
-from utils import dotdict
+from utils import compileKerasPredict, dotdict, fitKerasModel
 from NeuralNet import NeuralNet
 
 from .DotsAndBoxesNNet import DotsAndBoxesNNet as onnet
@@ -40,31 +40,35 @@ class NNetWrapper(NeuralNet):
         self.board_x, self.board_y = game.getBoardSize()
         self.action_size = game.getActionSize()
 
+        self.predictFunction = compileKerasPredict(self.nnet.model)
+
     def train(self, examples):
         """
         examples: list of examples, each example is of form (board, pi, v)
         """
-        input_boards, target_pis, target_vs = list(zip(*examples))
-        input_boards = np.asarray(input_boards)
-
-        normalize_score(input_boards)
+        def prepare(input_boards):
+            input_boards = np.asarray(input_boards)
+            normalize_score(input_boards)
+            return input_boards
 
-        target_pis = np.asarray(target_pis)
-        target_vs = np.asarray(target_vs)
-        self.nnet.model.fit(x=input_boards, y=[target_pis, target_vs], batch_size=args.batch_size, epochs=args.epochs)
+        fitKerasModel(self.nnet.model, examples, args.batch_size, args.epochs, prepare)
 
     def predict(self, board):
         """
         board: np array with board
         """
+        pis, vs = self.predict_batch([board])
+        return pis[0], vs[0]
 
-        board = np.copy(board)
-        board = board[np.newaxis, :, :]
-        normalize_score(board)
-
-        pi, v = self.nnet.model.predict(board, verbose=False)
+    def predict_batch(self, boards):
+        """
+        boards: list of np arrays with boards
+        """
+        boards = np.array(boards)
+        normalize_score(boards)
 
-        return pi[0], v[0]
+        pis, vs = self.predictFunction(boards.astype(np.float32))
+        return pis.numpy(), vs.numpy()[:, 0]
 
     def save_checkpoint(self, folder='checkpoint', filename='checkpoint.pth.tar'):
         # change extension
@@ -0,0 +1,115 @@
+"""
+use this script to export a checkpoint of the pytorch othello or tafl network
+for inference, to TorchScript (.pt) and, if the onnx package is installed, to
+ONNX (.onnx):
+
+    python export.py othello ./temp/ best.pth.tar
+    python export.py othello ./temp/ best.pth.tar --board 8 --channels 512 --formats torchscript
+    python export.py tafl ./temp/ best.pth.tar --variant Brandubh --out ./export/
+
+The exported network takes a float32 batch of canonical boards and returns
+the policies (probabilities, not logs) and the values. Each BatchNorm is
+folded into the layer before it and dropout is left out, and the TorchScript
+module is frozen, so the weights are constants of the graph. ExportedNNet
+serves the exported files, without the model code or the training wrapper.
+"""
+
+import argparse
+import inspect
+import logging
+import os
+
+import coloredlogs
+import torch
+import torch.nn as nn
+
+log = logging.getLogger(__name__)
+
+
+class InferenceModel(nn.Module):
+    """
+    The network as exported: boards in, policies and values out.
+    """
+
+    def __init__(self, nnet):
+        super(InferenceModel, self).__init__()
+        self.nnet = nnet
+
+    def forward(self, boards):
+        pi, v = self.nnet(boards)
+        return torch.exp(pi), v.view(-1)
+
+
+def exportNNet(nnet, folder, name, formats=('torchscript', 'onnx')):
+    """
+    Exports nnet, a pytorch NNetWrapper of othello or tafl, to
+    folder/name.pt (torchscript) and folder/name.onnx (onnx).
+
+    Returns:
+        filepaths: the files written
+    """
+    model = InferenceModel(nnet.nnet.fuseBatchNorm().cpu()).eval()
+    # two boards, so that nothing in the graph is specialized to a batch of one
+    boards = torch.zeros(2, nnet.board_x, nnet.board_y)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    filepaths = []
+    if 'torchscript' in formats:
+        filepath = os.path.join(folder, name + '.pt')
+        with torch.no_grad():
+            traced = torch.jit.freeze(torch.jit.trace(model, boards))
+        traced.save(filepath)
+        filepaths.append(filepath)
+    if 'onnx' in formats:
+        try:
+            import onnx  # optional, torch.onnx needs it to write the model
+        except ImportError:
+            log.warning('Skipping the ONNX export, which needs the onnx package (pip install onnx).')
+        else:
+            filepath = os.path.join(folder, name + '.onnx')
+            options = {}
+            if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+                # the TorchScript exporter, which newer torch versions no longer default to
+                options['dynamo'] = False
+            torch.onnx.export(model, (boards,), filepath, input_names=['boards'], output_names=['pis', 'vs'],
+                              dynamic_axes={'boards': {0: 'batch'}, 'pis': {0: 'batch'}, 'vs': {0: 'batch'}},
+                              **options)
+            filepaths.append(filepath)
+    return filepaths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('game', choices=['othello', 'tafl'])
+    parser.add_argument('folder', help='folder of the checkpoint')
+    parser.add_argument('filename', help='checkpoint file, e.g. best.pth.tar')
+    parser.add_argument('--board', type=int, default=6, help='othello board size')
+    parser.add_argument('--variant', default='Brandubh', help='tafl variant')
+    parser.add_argument('--channels', type=int, help='num_channels of the network (default: that of NNet.args)')
+    parser.add_argument('--formats', nargs='+', choices=['torchscript', 'onnx'], default=['torchscript', 'onnx'])
+    parser.add_argument('--out', help='folder of the exported files (default: the checkpoint folder)')
+    options = parser.parse_args()
+
+    if options.game == 'othello':
+        from othello.OthelloGame import OthelloGame
+        from othello.pytorch import NNet
+        game = OthelloGame(options.board)
+    else:
+        from tafl.TaflGame import TaflGame
+        from tafl.pytorch import NNet
+        game = TaflGame(options.variant)
+    NNet.args.cuda = False
+    if options.channels:
+        NNet.args.num_channels = options.channels
+
+    nnet = NNet.NNetWrapper(game)
+    nnet.load_checkpoint(options.folder, options.filename)
+    name = options.filename[:-len('.pth.tar')] if options.filename.endswith('.pth.tar') else options.filename
+    for filepath in exportNNet(nnet, options.out or options.folder, name, options.formats):
+        log.info(f'Exported {filepath}')
+
+
+if __name__ == "__main__":
+    coloredlogs.install(level='INFO')
+    main()
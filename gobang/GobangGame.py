@@ -1,7 +1,8 @@
 from __future__ import print_function
 import sys
 sys.path.append('..')
-from Game import Game
+from Game import Game, symmetryPermutations
+from ZobristHash import ZobristHash
 from .GobangLogic import Board
 import numpy as np
 
@@ -10,6 +11,10 @@ class GobangGame(Game):
     def __init__(self, n=15, nir=5):
         self.n = n
         self.n_in_row = nir
+        # mirror, rotational, see Game.getSymmetryPermutations
+        self.boardPerms, self.piPerms = symmetryPermutations(self._transformSymmetries, self.getBoardSize(),
+                                                             self.getActionSize())
+        self.zobrist = ZobristHash(self.n * self.n)
 
     def getInitBoard(self):
         # return initial board (numpy board)
@@ -35,6 +40,13 @@ class GobangGame(Game):
         b.execute_move(move, player)
         return (b.pieces, -player)
 
+    def getNextStateHash(self, board, player, action, boardHash):
+        # getNextState, updating the hash pair with the new piece
+        nextBoard, nextPlayer = self.getNextState(board, player, action)
+        if action != self.n * self.n:
+            boardHash = self.zobrist.updatePair(boardHash, action, 0, player)
+        return (nextBoard, nextPlayer, boardHash)
+
     # modified
     def getValidMoves(self, board, player):
         # return a fixed size binary vector
@@ -80,7 +92,7 @@ class GobangGame(Game):
         return player * board
 
     # modified
-    def getSymmetries(self, board, pi):
+    def _transformSymmetries(self, board, pi):
         # mirror, rotational
         assert(len(pi) == self.n**2 + 1)  # 1 for pass
         pi_board = np.reshape(pi[:-1], (self.n, self.n))
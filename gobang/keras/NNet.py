@@ -31,30 +31,28 @@ class NNetWrapper(NeuralNet):
         self.board_x, self.board_y = game.getBoardSize()
         self.action_size = game.getActionSize()
 
+        self.predictFunction = compileKerasPredict(self.nnet.model)
+
     def train(self, examples):
         """
         examples: list of examples, each example is of form (board, pi, v)
         """
-        input_boards, target_pis, target_vs = list(zip(*examples))
-        input_boards = np.asarray(input_boards)
-        target_pis = np.asarray(target_pis)
-        target_vs = np.asarray(target_vs)
-        self.nnet.model.fit(x = input_boards, y = [target_pis, target_vs], batch_size = args.batch_size, epochs = args.epochs)
+        fitKerasModel(self.nnet.model, examples, args.batch_size, args.epochs)
 
     def predict(self, board):
         """
         board: np array with board
         """
-        # timing
-        # start = time.time()
-
-        # preparing input
-        board = board[np.newaxis, :, :]
-        
-        pi, v = self.nnet.model.predict(board, verbose=False)
+        pis, vs = self.predict_batch([board])
+        return pis[0], vs[0]
 
-        #print('PREDICTION TIME TAKEN : {0:03f}'.format(time.time()-start))
-        return pi[0], v[0]
+    def predict_batch(self, boards):
+        """
+        boards: list of np arrays with boards
+        """
+        # run
+        pis, vs = self.predictFunction(np.array(boards, dtype=np.float32))
+        return pis.numpy(), vs.numpy()[:, 0]
 
     def save_checkpoint(self, folder='checkpoint', filename='checkpoint.pth.tar'):
         # change extension
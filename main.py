@@ -19,12 +19,33 @@ args = dotdict({
     'maxlenOfQueue': 200000,    # Number of game examples to train the neural networks.
     'numMCTSSims': 25,          # Number of games moves for MCTS to simulate.
     'arenaCompare': 40,         # Number of games to play during arena play to determine if new net will be accepted.
+    'arenaSPRT': False,         # Stop the arena as soon as a sequential probability ratio test accepts or rejects the new net.
+    'sprtMargin': 0.1,          # The test is between the new net winning updateThreshold -/+ sprtMargin of the decisive games,
+    'sprtAlpha': 0.05,          # with this probability of accepting a net at or below updateThreshold - sprtMargin,
+    'sprtBeta': 0.05,           # and this one of rejecting a net at or above updateThreshold + sprtMargin.
     'cpuct': 1,
+    'mctsEngine': 'dict',       # 'dict' for MCTS, 'array' for the array backed ArrayMCTS (about half the memory per node, slower per simulation).
+    'mctsBatchSize': 1,         # Leaves evaluated per neural net call, with virtual loss. Needs mctsEngine 'array'.
+    'virtualLoss': 1,           # Visits, each counted as a loss, added to an edge while a batch waits for the neural net.
+    'reuseTree': False,         # Keep the searched subtree of the position reached after each move, release the rest.
+    'evalCacheSize': 0,         # Neural net evaluations kept in an LRU cache shared by all MCTS instances. 0 disables it.
+    'boardHashKeys': True,      # Key MCTS states by the game's incremental board hash, if it implements getBoardHash.
+    'numSelfPlayWorkers': 0,    # Processes playing the self-play episodes. 0 plays them in the main process.
+    'inferenceServer': False,   # Self-play workers send their boards to one process that evaluates them in batches.
+    'inferenceMaxBatch': 64,    # Most boards the inference server evaluates at once.
+    'inferenceMaxWait': 0.002,  # Seconds the inference server waits for more boards before evaluating a batch.
+    'numLockstepGames': 0,      # Self-play games searched together in this process, their leaves evaluated in one batch.
+    'lazySymmetries': False,    # Store each position once and apply a random symmetry when it is sampled for training.
+    'symmetryKeys': False,      # Key MCTS states and cached evaluations by symmetry class, so symmetrical positions share them.
+    'numArenaWorkers': 0,       # Processes playing the arena games of learn. 0 plays them in the main process.
+    'arenaLockstepGames': 0,    # Arena games searched together, the leaves of each net evaluated in one batch per step.
+    'asyncPipeline': False,     # Self-play, training and gating run at the same time. Needs numSelfPlayWorkers > 0.
 
     'checkpoint': './temp/',
     'load_model': False,
     'load_folder_file': ('/dev/models/8x100x50','best.pth.tar'),
     'numItersForTrainExamplesHistory': 20,
+    'replayBuffer': False,      # Keep the examples in memory-mapped .npy shards, one per iteration, under checkpoint/replay.
 
 })
 
@@ -1,7 +1,8 @@
 from __future__ import print_function
 import sys
 sys.path.append('..')
-from Game import Game
+from Game import Game, symmetryPermutations
+from ZobristHash import ZobristHash
 from .OthelloLogic import Board
 import numpy as np
 
@@ -18,6 +19,10 @@ class OthelloGame(Game):
 
     def __init__(self, n):
         self.n = n
+        # mirror, rotational, see Game.getSymmetryPermutations
+        self.boardPerms, self.piPerms = symmetryPermutations(self._transformSymmetries, self.getBoardSize(),
+                                                             self.getActionSize())
+        self.zobrist = ZobristHash(n*n)
 
     def getInitBoard(self):
         # return initial board (numpy board)
@@ -43,6 +48,18 @@ class OthelloGame(Game):
         b.execute_move(move, player)
         return (b.pieces, -player)
 
+    def getNextStateHash(self, board, player, action, boardHash):
+        # getNextState, updating the hash pair with the flipped squares
+        if action == self.n*self.n:
+            return (board, -player, boardHash)
+        b = Board(self.n)
+        b.pieces = np.copy(board)
+        move = (int(action/self.n), action%self.n)
+        # every direction's flips start with the move itself
+        for x, y in {(x, y) for x, y in b.execute_move(move, player)}:
+            boardHash = self.zobrist.updatePair(boardHash, self.n*x+y, board[x][y], player)
+        return (b.pieces, -player, boardHash)
+
     def getValidMoves(self, board, player):
         # return a fixed size binary vector
         valids = [0]*self.getActionSize()
@@ -73,7 +90,7 @@ class OthelloGame(Game):
         # return state if player==1, else return -state if player==-1
         return player*board
 
-    def getSymmetries(self, board, pi):
+    def _transformSymmetries(self, board, pi):
         # mirror, rotational
         assert(len(pi) == self.n**2+1)  # 1 for pass
         pi_board = np.reshape(pi[:-1], (self.n, self.n))
@@ -32,6 +32,12 @@ class NNetWrapper(NeuralNet):
 
         if args.cuda:
             self.nnet.cuda()
+        # the network in eval mode with its BatchNorms folded in, for predictions only
+        self.updateInferenceNNet()
+
+        # predict_batch copies the boards into this buffer, which shares its memory with inputTensor
+        self.inputBuffer = np.empty((0, self.board_x, self.board_y), dtype=np.float32)
+        self.inputTensor = torch.from_numpy(self.inputBuffer)
 
     def train(self, examples):
         """
@@ -50,7 +56,11 @@ class NNetWrapper(NeuralNet):
             t = tqdm(range(batch_count), desc='Training Net')
             for _ in t:
                 sample_ids = np.random.randint(len(examples), size=args.batch_size)
-                boards, pis, vs = list(zip(*[examples[i] for i in sample_ids]))
+                if hasattr(examples, 'getBatch'):
+                    # e.g. SymmetricExamples, which applies the symmetries to the whole batch
+                    boards, pis, vs = examples.getBatch(sample_ids)
+                else:
+                    boards, pis, vs = list(zip(*[examples[i] for i in sample_ids]))
                 boards = torch.FloatTensor(np.array(boards).astype(np.float64))
                 target_pis = torch.FloatTensor(np.array(pis))
                 target_vs = torch.FloatTensor(np.array(vs).astype(np.float64))
@@ -75,23 +85,41 @@ class NNetWrapper(NeuralNet):
                 total_loss.backward()
                 optimizer.step()
 
+        self.updateInferenceNNet()
+
+    def updateInferenceNNet(self):
+        """
+        Rebuilds inferenceNNet, the copy of the network predict_batch uses, from
+        the weights of nnet. train and load_checkpoint call it, call it after
+        changing the weights of nnet any other way.
+        """
+        self.inferenceNNet = self.nnet.fuseBatchNorm()
+
     def predict(self, board):
         """
         board: np array with board
         """
-        # timing
-        start = time.time()
-
-        # preparing input
-        board = torch.FloatTensor(board.astype(np.float64))
-        if args.cuda: board = board.contiguous().cuda()
-        board = board.view(1, self.board_x, self.board_y)
-        self.nnet.eval()
-        with torch.no_grad():
-            pi, v = self.nnet(board)
+        pis, vs = self.predict_batch([board])
+        return pis[0], vs[0]
 
-        # print('PREDICTION TIME TAKEN : {0:03f}'.format(time.time()-start))
-        return torch.exp(pi).data.cpu().numpy()[0], v.data.cpu().numpy()[0]
+    def predict_batch(self, boards):
+        """
+        boards: list of np arrays with boards
+        """
+        # preparing input, in the float32 buffer
+        n = len(boards)
+        if n > len(self.inputBuffer):
+            self.inputBuffer = np.empty((max(n, 2 * len(self.inputBuffer)), self.board_x, self.board_y),
+                                        dtype=np.float32)
+            self.inputTensor = torch.from_numpy(self.inputBuffer)
+        for i, board in enumerate(boards):
+            self.inputBuffer[i] = board
+        inputs = self.inputTensor[:n]
+        if args.cuda: inputs = inputs.cuda()
+
+        with torch.inference_mode():
+            pi, v = self.inferenceNNet(inputs)
+            return torch.exp(pi).cpu().numpy(), v.cpu().numpy()[:, 0]
 
     def loss_pi(self, targets, outputs):
         return -torch.sum(targets * outputs) / targets.size()[0]
@@ -118,3 +146,4 @@ class NNetWrapper(NeuralNet):
         map_location = None if args.cuda else 'cpu'
         checkpoint = torch.load(filepath, map_location=map_location)
         self.nnet.load_state_dict(checkpoint['state_dict'])
+        self.updateInferenceNNet()
@@ -1,3 +1,4 @@
+import copy
 import sys
 sys.path.append('..')
 from utils import *
@@ -7,6 +8,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
+from torch.nn.utils.fusion import fuse_conv_bn_eval, fuse_linear_bn_eval
 
 class OthelloNNet(nn.Module):
     def __init__(self, game, args):
@@ -52,3 +54,19 @@ class OthelloNNet(nn.Module):
         v = self.fc4(s)                                                                          # batch_size x 1
 
         return F.log_softmax(pi, dim=1), torch.tanh(v)
+
+    def fuseBatchNorm(self):
+        """
+        Returns a copy of the network for inference only: in eval mode, with
+        each BatchNorm folded into the weights of the conv or fc layer before
+        it and replaced by an identity. The outputs are those of the network
+        in eval mode.
+        """
+        fused = copy.deepcopy(self).eval()
+        for layer, bn in [('conv1', 'bn1'), ('conv2', 'bn2'), ('conv3', 'bn3'), ('conv4', 'bn4')]:
+            setattr(fused, layer, fuse_conv_bn_eval(getattr(fused, layer), getattr(fused, bn)))
+            setattr(fused, bn, nn.Identity())
+        for layer, bn in [('fc1', 'fc_bn1'), ('fc2', 'fc_bn2')]:
+            setattr(fused, layer, fuse_linear_bn_eval(getattr(fused, layer), getattr(fused, bn)))
+            setattr(fused, bn, nn.Identity())
+        return fused
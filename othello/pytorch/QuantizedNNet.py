@@ -0,0 +1,152 @@
+import logging
+import os
+import sys
+
+import numpy as np
+
+sys.path.append('../../')
+from utils import *
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+try:
+    from torch.ao.nn.intrinsic import ConvReLU2d
+except ImportError:  # torch < 1.13
+    from torch.nn.intrinsic import ConvReLU2d
+from torch.ao.quantization import DeQuantStub, QuantStub, convert, get_default_qconfig, prepare, quantize_dynamic
+
+from .NNet import NNetWrapper, args
+
+log = logging.getLogger(__name__)
+
+quantArgs = dotdict({
+    'calibrationSize': 512,     # Boards the activations of the convs are calibrated on, kept in the checkpoints.
+    # The quantized backend: 'x86' (torch >= 2.0) or 'fbgemm' on servers, 'qnnpack' on ARM.
+    'engine': 'x86' if 'x86' in torch.backends.quantized.supported_engines else 'fbgemm',
+})
+
+
+class QuantizedOthelloNNet(nn.Module):
+    """
+    An int8 copy of an OthelloNNet, for inference on CPU. The convs (with
+    their BatchNorm folded in and their relu fused) are quantized statically:
+    their activations stay int8 from the first conv to the last, with scales
+    calibrated on sample boards. The fc layers are quantized dynamically:
+    int8 weights, activations quantized on the fly.
+
+    Build it with quantizeOthelloNNet.
+    """
+
+    def __init__(self, nnet):
+        super(QuantizedOthelloNNet, self).__init__()
+        self.board_x, self.board_y = nnet.board_x, nnet.board_y
+        fused = nnet.fuseBatchNorm().cpu()
+        self.quant = QuantStub()
+        self.convs = nn.Sequential(*[ConvReLU2d(conv, nn.ReLU()) for conv in
+                                     [fused.conv1, fused.conv2, fused.conv3, fused.conv4]])
+        self.dequant = DeQuantStub()
+        self.fc1 = fused.fc1
+        self.fc2 = fused.fc2
+        self.fc3 = fused.fc3
+        self.fc4 = fused.fc4
+
+    def forward(self, s):
+        s = s.view(-1, 1, self.board_x, self.board_y)
+        s = self.dequant(self.convs(self.quant(s)))
+        # the quantized convs return channels last, so the flattening copies
+        s = s.reshape(s.size(0), -1)
+        s = F.relu(self.fc1(s))
+        s = F.relu(self.fc2(s))
+        return F.log_softmax(self.fc3(s), dim=1), torch.tanh(self.fc4(s))
+
+
+def quantizeOthelloNNet(nnet, boards):
+    """
+    Returns a QuantizedOthelloNNet of the OthelloNNet nnet, the scales of
+    the activations of its convs calibrated on boards, an array of
+    canonical boards.
+    """
+    torch.backends.quantized.engine = quantArgs.engine
+    model = QuantizedOthelloNNet(nnet).eval()
+    qconfig = get_default_qconfig(quantArgs.engine)
+    model.quant.qconfig = model.convs.qconfig = model.dequant.qconfig = qconfig
+    prepare(model, inplace=True)
+    with torch.no_grad():
+        for i in range(0, len(boards), 64):
+            model(torch.from_numpy(np.asarray(boards[i:i + 64], dtype=np.float32)))
+    convert(model, inplace=True)
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+class QuantizedNNetWrapper(NNetWrapper):
+    """
+    The othello NNetWrapper, predicting with an int8 copy of its network
+    (see QuantizedOthelloNNet) once it has calibration boards. MCTS, Coach
+    and the arenas use it like the NNetWrapper it extends.
+
+    train trains the float network as usual, then quantizes it again,
+    calibrated on a sample of the boards it was trained on. The calibration
+    boards are saved in the checkpoints, so load_checkpoint quantizes the
+    network it loads (in a self-play worker, for instance) without examples.
+    A checkpoint saved by NNetWrapper has none: until calibrate is called,
+    predictions come from the float network.
+    """
+
+    def __init__(self, game):
+        super(QuantizedNNetWrapper, self).__init__(game)
+        self.calibrationBoards = None
+        self.qnnet = None
+
+    def calibrate(self, boards):
+        """
+        Quantizes the network, calibrated on boards (at most
+        quantArgs.calibrationSize of them are kept).
+        """
+        boards = np.asarray(boards)
+        if len(boards) > quantArgs.calibrationSize:
+            boards = boards[np.random.choice(len(boards), quantArgs.calibrationSize, replace=False)]
+        self.calibrationBoards = boards.astype(np.int8)
+        self.qnnet = quantizeOthelloNNet(self.nnet, self.calibrationBoards)
+
+    def train(self, examples):
+        super(QuantizedNNetWrapper, self).train(examples)
+        sample_ids = np.random.choice(len(examples), min(len(examples), quantArgs.calibrationSize), replace=False)
+        self.calibrate([examples[i][0] for i in sample_ids])
+
+    def predict_batch(self, boards):
+        """
+        boards: list of np arrays with boards
+        """
+        if self.qnnet is None:
+            return super(QuantizedNNetWrapper, self).predict_batch(boards)
+        with torch.inference_mode():
+            pi, v = self.qnnet(torch.from_numpy(np.array(boards, dtype=np.float32)))
+            return torch.exp(pi).numpy(), v.numpy()[:, 0]
+
+    def save_checkpoint(self, folder='checkpoint', filename='checkpoint.pth.tar'):
+        filepath = os.path.join(folder, filename)
+        if not os.path.exists(folder):
+            print("Checkpoint Directory does not exist! Making directory {}".format(folder))
+            os.mkdir(folder)
+        else:
+            print("Checkpoint Directory exists! ")
+        checkpoint = {'state_dict': self.nnet.state_dict()}
+        if self.calibrationBoards is not None:
+            # NNetWrapper.load_checkpoint ignores them
+            checkpoint['calibration_boards'] = torch.from_numpy(self.calibrationBoards)
+        torch.save(checkpoint, filepath)
+
+    def load_checkpoint(self, folder='checkpoint', filename='checkpoint.pth.tar'):
+        filepath = os.path.join(folder, filename)
+        if not os.path.exists(filepath):
+            raise FileNotFoundError("No model in path {}".format(filepath))
+        map_location = None if args.cuda else 'cpu'
+        checkpoint = torch.load(filepath, map_location=map_location)
+        self.nnet.load_state_dict(checkpoint['state_dict'])
+        self.updateInferenceNNet()
+        if 'calibration_boards' in checkpoint:
+            self.calibrate(checkpoint['calibration_boards'].cpu().numpy())
+        else:
+            log.warning(f'No calibration boards in {filename}, predicting with the float network until calibrate.')
+            self.calibrationBoards = self.qnnet = None
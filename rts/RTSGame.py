@@ -6,6 +6,7 @@ import numpy as np
 from rts.src.config_class import CONFIG
 
 sys.path.append('..')
+from Game import Game, symmetryPermutations
 from rts.src.Board import Board
 from rts.src.config import NUM_ENCODERS, NUM_ACTS, P_NAME_IDX, A_TYPE_IDX, TIME_IDX, FPS
 
@@ -20,10 +21,13 @@ Includes:
 
 
 # noinspection PyPep8Naming,PyMethodMayBeStatic
-class RTSGame:
+class RTSGame(Game):
 
     def __init__(self) -> None:
         self.n = CONFIG.grid_size
+        # mirror, rotational, see Game.getSymmetryPermutations
+        self.boardPerms, self.piPerms = symmetryPermutations(self._transformSymmetries, self.getBoardSize(),
+                                                             self.getActionSize())
 
         self.initial_board_config = CONFIG.initial_board_config
 
@@ -175,7 +179,7 @@ class RTSGame:
         b[:, :, P_NAME_IDX] = b[:, :, P_NAME_IDX] * player
         return b
 
-    def getSymmetries(self, board: np.ndarray, pi):
+    def _transformSymmetries(self, board: np.ndarray, pi):
         # mirror, rotational
         assert (len(pi) == self.n * self.n * NUM_ACTS + 1)  # 1 for pass
         pi_board = np.reshape(pi[:-1], (self.n, self.n, NUM_ACTS))
@@ -190,6 +194,13 @@ class RTSGame:
                 return_list += [(newB, list(newPi.ravel()) + [pi[-1]])]
         return return_list
 
+    def getSymmetryCanonicalForm(self, board: np.ndarray):
+        """
+        Returns the board unchanged with the identity permutation. Actions encode directions (up, attack_left, ...),
+        which getSymmetries does not remap when it rotates the board, so symmetrical boards can't be merged safely.
+        """
+        return board, np.arange(self.getActionSize())
+
     def stringRepresentation(self, board: np.ndarray):
         return board.tostring()
 
@@ -5,6 +5,7 @@ import numpy as np
 
 sys.path.append('../..')
 from NeuralNet import NeuralNet
+from utils import compileKerasPredict, fitKerasModel
 from rts.keras.RTSNNet import RTSNNet
 from rts.src.config import VERBOSE_MODEL_FIT
 
@@ -36,6 +37,8 @@ class NNetWrapper(NeuralNet):
 
         self.encoder = encoder
 
+        self.predictFunction = compileKerasPredict(self.nnet.model)
+
     def train(self, examples):
         """
         Encodes examples using one of 2 encoders and starts fitting.
@@ -43,17 +46,11 @@ class NNetWrapper(NeuralNet):
         """
         from rts.src.config_class import CONFIG
 
-        input_boards, target_pis, target_vs = list(zip(*examples))
-        input_boards = np.asarray(input_boards)
-        target_pis = np.asarray(target_pis)
-        target_vs = np.asarray(target_vs)
-
         """
         input_boards = CONFIG.nnet_args.encoder.encode_multiple(input_boards)
         """
-        input_boards = self.encoder.encode_multiple(input_boards)
-
-        self.nnet.model.fit(x=input_boards, y=[target_pis, target_vs], batch_size=CONFIG.nnet_args.batch_size, epochs=CONFIG.nnet_args.epochs, verbose=VERBOSE_MODEL_FIT)
+        fitKerasModel(self.nnet.model, examples, CONFIG.nnet_args.batch_size, CONFIG.nnet_args.epochs,
+                      self.encoder.encode_multiple, verbose=VERBOSE_MODEL_FIT)
 
     def predict(self, board, player=None):
         """
@@ -63,14 +60,20 @@ class NNetWrapper(NeuralNet):
         :param player: specific player
         :return: vector of predicted actions and win prediction (Pi, V)
         """
-        board = self.encoder.encode(board)
+        pis, vs = self.predict_batch([board])
+        return pis[0], vs[0]
 
-        # preparing input
-        board = board[np.newaxis, :, :]
+    def predict_batch(self, boards):
+        """
+        Predicts the actions and win predictions of several boards at once.
+        :param boards: list of boards, each encoded like in predict
+        :return: arrays of the predicted actions and win predictions (Pis, Vs)
+        """
+        boards = np.array([self.encoder.encode(board) for board in boards])
 
         # run
-        pi, v = self.nnet.model.predict(board, verbose=False)
-        return pi[0], v[0]
+        pis, vs = self.predictFunction(boards.astype(np.float32))
+        return pis.numpy(), vs.numpy()[:, 0]
 
     def save_checkpoint(self, folder='checkpoint', filename='checkpoint.pth.tar'):
         # change extension
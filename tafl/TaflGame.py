@@ -2,6 +2,7 @@ from __future__ import print_function
 import sys
 sys.path.append('..')
 from Game import Game
+from ZobristHash import ZobristHash
 from .TaflLogic import Board
 import numpy as np
 from .GameVariants import *
@@ -12,6 +13,8 @@ class TaflGame(Game):
     def __init__(self, name):
         self.name = name
         self.getInitBoard()
+        # keys for the pieces on each square, and the key of square n*n for black to move
+        self.zobrist = ZobristHash(self.n*self.n + 1, values=(-1, 1, 2))
 
     def getInitBoard(self):    
         board=Board(Brandubh())
@@ -41,6 +44,16 @@ class TaflGame(Game):
         b.execute_move(move, player)
         return (b, -player)
 
+    def getNextStateHash(self, board, player, action, boardHash):
+        # getNextState, updating the hash with the pieces that moved or were captured
+        b, nextPlayer = self.getNextState(board, player, action)
+        for old, new in zip(board.pieces, b.pieces):
+            if old[0] != new[0] or old[1] != new[1]:
+                boardHash ^= self._pieceHash(old) ^ self._pieceHash(new)
+        if b.time != board.time:
+            boardHash ^= self.zobrist.keys[self.n*self.n][1]
+        return (b, nextPlayer, boardHash)
+
     def getValidMoves(self, board, player):
         # return a fixed size binary vector
         #Note: Ignoreing the passed in player variable since we are not inverting colors for getCanonicalForm and Arena calls with constant 1.
@@ -63,6 +76,24 @@ class TaflGame(Game):
         # rules and objectives are different for the different players, so inverting board results in an invalid state.
         return b
 
+    def getBoardHash(self, board):
+        # identifies the same boards as stringRepresentation: the player to move and the pieces on each square
+        boardHash = 0
+        for piece in board.pieces:
+            boardHash ^= self._pieceHash(piece)
+        if board.getPlayerToMove() == -1:
+            boardHash ^= self.zobrist.keys[self.n*self.n][1]
+        return boardHash
+
+    def getCanonicalHash(self, boardHash, player):
+        # the canonical form is the board itself
+        return boardHash
+
+    def _pieceHash(self, piece):
+        x, y, piecetype = piece
+        if x < 0: return 0  # captured
+        return self.zobrist.keys[y*self.n + x][piecetype]
+
     def getSymmetries(self, board, pi):
         return [(board,pi)]
         # mirror, rotational
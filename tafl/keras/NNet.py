@@ -28,31 +28,33 @@ class NNetWrapper(NeuralNet):
         self.board_x, self.board_y = game.getBoardSize()
         self.action_size = game.getActionSize()
 
+        self.predictFunction = compileKerasPredict(self.nnet.model)
+
     def train(self, examples):
         """
         examples: list of examples, each example is of form (board, pi, v)
         """
-        input_boards, target_pis, target_vs = list(zip(*examples))
-        input_boards = np.asarray(input_boards)
-        target_pis = np.asarray(target_pis)
-        target_vs = np.asarray(target_vs)
-        self.nnet.model.fit(x = input_boards, y = [target_pis, target_vs], batch_size = args.batch_size, epochs = args.epochs)
+        # Board.astype converts a board to an array, as in predict_batch
+        fitKerasModel(self.nnet.model, examples, args.batch_size, args.epochs,
+                      lambda boards: np.array([board.astype(np.float32) for board in boards]))
 
     def predict(self, board):
         """
         board: np array with board
         """
-        # timing
-        start = time.time()
+        pis, vs = self.predict_batch([board])
+        return pis[0], vs[0]
 
-        # preparing input
-        board = board[np.newaxis, :, :]
+    def predict_batch(self, boards):
+        """
+        boards: list of np arrays with boards
+        """
+        # preparing input, Board.astype converts a board to an array
+        boards = np.array([board.astype(np.float32) for board in boards])
 
         # run
-        pi, v = self.nnet.model.predict(board, verbose=False)
-
-        #print('PREDICTION TIME TAKEN : {0:03f}'.format(time.time()-start))
-        return pi[0], v[0]
+        pis, vs = self.predictFunction(boards)
+        return pis.numpy(), vs.numpy()[:, 0]
 
     def save_checkpoint(self, folder='checkpoint', filename='checkpoint.pth.tar'):
         # change extension
@@ -33,6 +33,8 @@ class NNetWrapper(NeuralNet):
 
         if args.cuda:
             self.nnet.cuda()
+        # the network in eval mode with its BatchNorms folded in, for predictions only
+        self.updateInferenceNNet()
 
     def train(self, examples):
         """
@@ -76,23 +78,35 @@ class NNetWrapper(NeuralNet):
                 total_loss.backward()
                 optimizer.step()
 
+        self.updateInferenceNNet()
+
+    def updateInferenceNNet(self):
+        """
+        Rebuilds inferenceNNet, the copy of the network predict_batch uses, from
+        the weights of nnet. train and load_checkpoint call it, call it after
+        changing the weights of nnet any other way.
+        """
+        self.inferenceNNet = self.nnet.fuseBatchNorm()
+
     def predict(self, board):
         """
         board: np array with board
         """
-        # timing
-        start = time.time()
-
-        # preparing input
-        board = torch.FloatTensor(board.astype(np.float64))
-        if args.cuda: board = board.contiguous().cuda()
-        board = board.view(1, self.board_x, self.board_y)
-        self.nnet.eval()
+        pis, vs = self.predict_batch([board])
+        return pis[0], vs[0]
+
+    def predict_batch(self, boards):
+        """
+        boards: list of np arrays with boards
+        """
+        # preparing input, Board.astype converts a board to an array
+        boards = torch.FloatTensor(np.array([board.astype(np.float64) for board in boards]))
+        if args.cuda: boards = boards.contiguous().cuda()
+        boards = boards.view(-1, self.board_x, self.board_y)
         with torch.no_grad():
-            pi, v = self.nnet(board)
+            pi, v = self.inferenceNNet(boards)
 
-        # print('PREDICTION TIME TAKEN : {0:03f}'.format(time.time()-start))
-        return torch.exp(pi).data.cpu().numpy()[0], v.data.cpu().numpy()[0]
+        return torch.exp(pi).data.cpu().numpy(), v.data.cpu().numpy()[:, 0]
 
     def loss_pi(self, targets, outputs):
         return -torch.sum(targets * outputs) / targets.size()[0]
@@ -119,3 +133,4 @@ class NNetWrapper(NeuralNet):
         map_location = None if args.cuda else 'cpu'
         checkpoint = torch.load(filepath, map_location=map_location)
         self.nnet.load_state_dict(checkpoint['state_dict'])
+        self.updateInferenceNNet()
@@ -0,0 +1,138 @@
+import unittest
+
+import numpy as np
+
+from Arena import Arena, sprtDecision
+from BatchedArena import BatchedArena
+import ParallelArena as parallelArena
+from ParallelArena import MCTSPlayerFactory, ParallelArena
+from test_mcts import CountingNNet, FakeNNet
+from tictactoe.TicTacToeGame import TicTacToeGame
+from utils import dotdict
+
+
+class ValidMovePlayerFactory():
+    """
+    Builds players that play the first (or last) valid move, or a random one.
+    """
+
+    def __init__(self, choice):
+        self.choice = choice
+
+    def __call__(self, game):
+        def play(board):
+            valids = np.flatnonzero(game.getValidMoves(board, 1))
+            if self.choice == 'random':
+                return np.random.choice(valids)
+            return valids[0] if self.choice == 'first' else valids[-1]
+
+        return play
+
+
+class TestParallelArena(unittest.TestCase):
+
+    def setUp(self):
+        self.game = TicTacToeGame()
+
+    def test_same_results_as_arena(self):
+        first, last = ValidMovePlayerFactory('first'), ValidMovePlayerFactory('last')
+        expected = Arena(first(self.game), last(self.game), self.game).playGames(6)
+        self.assertEqual(ParallelArena(first, last, self.game, 2).playGames(6), expected)
+
+    def test_seeded_games_repeat(self):
+        player = ValidMovePlayerFactory('random')
+        results = []
+        for _ in range(2):
+            np.random.seed(0)
+            results.append(ParallelArena(player, player, self.game, 2).playGames(10))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(sum(results[0]), 10)
+
+    def test_sprt_counts_games_in_order(self):
+        sprt = (0.3, 0.6, 0.2, 0.2)
+        random, first = ValidMovePlayerFactory('random'), ValidMovePlayerFactory('first')
+
+        # the same games, played in turn
+        np.random.seed(0)
+        seeds = np.random.randint(2 ** 31, size=40)
+        parallelArena.initArenaWorker(random, first, self.game)
+        results = [0, 0, 0]
+        for i, seed in enumerate(seeds):
+            gameResult = parallelArena.playArenaGame((i % 2 == 1, int(seed)))
+            results[0 if gameResult == 1 else 1 if gameResult == -1 else 2] += 1
+            if sprtDecision(results[1], results[0], *sprt) is not None:
+                break
+        self.assertLess(sum(results), 40)
+
+        np.random.seed(0)
+        self.assertEqual(ParallelArena(random, first, self.game, 3).playGames(40, sprt=sprt), tuple(results))
+
+    def test_mcts_players(self):
+        args = dotdict({'numMCTSSims': 5, 'cpuct': 1.0})
+        player = MCTSPlayerFactory(FakeNNet, 'checkpoint', 'best.pth.tar', args)
+        oneWon, twoWon, draws = ParallelArena(player, player, self.game, 2).playGames(4)
+        self.assertEqual(oneWon + twoWon + draws, 4)
+
+
+class TestBatchedArena(unittest.TestCase):
+
+    def test_batches_the_leaves_of_each_network(self):
+        game = TicTacToeGame()
+        nnet1, nnet2 = CountingNNet(game), CountingNNet(game)
+        args = dotdict({'numMCTSSims': 10, 'cpuct': 1.0})
+        oneWon, twoWon, draws = BatchedArena(nnet1, nnet2, game, args, 4).playGames(8)
+
+        self.assertEqual(oneWon + twoWon + draws, 8)
+        # every game waits for one network or the other
+        self.assertEqual(max(nnet1.batches + nnet2.batches), 4)
+        self.assertGreater(min(nnet1.batches + nnet2.batches), 0)
+
+    def test_stops_early(self):
+        game = TicTacToeGame()
+        args = dotdict({'numMCTSSims': 10, 'cpuct': 1.0})
+        arena = BatchedArena(FakeNNet(game), FakeNNet(game), game, args, 2)
+        oneWon, twoWon, draws = arena.playGames(40, sprt=(0.01, 0.02, 0.05, 0.05))
+        self.assertLess(oneWon + twoWon + draws, 40)
+
+    def test_sprt_counts_games_in_order(self):
+        game = TicTacToeGame()
+        args = dotdict({'numMCTSSims': 10, 'cpuct': 1.0})
+        nnet1, nnet2 = FakeNNet(game), CountingNNet(game)
+        sprt = (0.3, 0.6, 0.2, 0.2)
+        # one game at a time, the games end in the order they start
+        expected = BatchedArena(nnet1, nnet2, game, args, 1).playGames(40, sprt=sprt)
+        self.assertEqual(BatchedArena(nnet1, nnet2, game, args, 5).playGames(40, sprt=sprt), expected)
+
+
+class TestArena(unittest.TestCase):
+
+    def test_players_are_told_when_games_start(self):
+        game = TicTacToeGame()
+        first, last = ValidMovePlayerFactory('first')(game), ValidMovePlayerFactory('last')(game)
+        started = []
+        first.startGame = lambda: started.append('first')
+        Arena(first, last, game).playGames(4)
+        self.assertEqual(started, ['first'] * 4)
+
+
+class TestSPRT(unittest.TestCase):
+
+    def test_decision(self):
+        sprt = (0.5, 0.7, 0.05, 0.05)
+        self.assertTrue(sprtDecision(10, 0, *sprt))
+        self.assertFalse(sprtDecision(20, 20, *sprt))
+        self.assertIsNone(sprtDecision(3, 3, *sprt))
+
+    def test_stops_early(self):
+        game = TicTacToeGame()
+        args = dotdict({'numMCTSSims': 100, 'cpuct': 1.0})
+        mctsPlayer = MCTSPlayerFactory(FakeNNet, 'checkpoint', 'best.pth.tar', args)(game)
+        np.random.seed(0)
+        arena = Arena(ValidMovePlayerFactory('random')(game), mctsPlayer, game)
+        oneWon, twoWon, draws = arena.playGames(40, sprt=(0.5, 0.7, 0.05, 0.05))
+        self.assertLess(oneWon + twoWon + draws, 40)
+        self.assertTrue(sprtDecision(twoWon, oneWon, 0.5, 0.7, 0.05, 0.05))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from CachedNNet import CachedNNet
+from test_mcts import CountingNNet
+from tictactoe.TicTacToeGame import TicTacToeGame
+
+
+class TestCachedNNet(unittest.TestCase):
+
+    def setUp(self):
+        self.game = TicTacToeGame()
+        self.boards = []
+        board, player = self.game.getInitBoard(), 1
+        for action in [0, 4, 8, 2]:
+            board, player = self.game.getNextState(board, player, action)
+            self.boards.append(self.game.getCanonicalForm(board, player))
+
+    def test_predict_hits(self):
+        nnet = CachedNNet(self.game, CountingNNet(self.game), 10)
+        pi, v = nnet.predict(self.boards[0])
+        cachedPi, cachedV = nnet.predict(self.boards[0].copy())
+        np.testing.assert_array_equal(pi, cachedPi)
+        self.assertEqual(v, cachedV)
+        self.assertEqual((nnet.hits, nnet.misses), (1, 1))
+        self.assertEqual(nnet.hitRate(), 0.5)
+
+    def test_evicts_least_recently_used(self):
+        nnet = CachedNNet(self.game, CountingNNet(self.game), 2)
+        nnet.predict(self.boards[0])
+        nnet.predict(self.boards[1])
+        nnet.predict(self.boards[0])
+        nnet.predict(self.boards[2])  # evicts boards[1]
+        nnet.resetCounters()
+
+        nnet.predict(self.boards[0])
+        nnet.predict(self.boards[1])
+        self.assertEqual((nnet.hits, nnet.misses), (1, 1))
+
+    def test_predict_batch_evaluates_misses_once(self):
+        inner = CountingNNet(self.game)
+        nnet = CachedNNet(self.game, inner, 10)
+        nnet.predict(self.boards[0])
+        pis, vs = nnet.predict_batch(self.boards)
+
+        self.assertEqual(inner.batches, [3])
+        self.assertEqual(pis.shape, (4, self.game.getActionSize()))
+        self.assertEqual(vs.shape, (4,))
+        expectedPis, expectedVs = inner.predict_batch(self.boards)
+        np.testing.assert_allclose(pis, expectedPis)
+        np.testing.assert_allclose(vs, expectedVs)
+
+    def test_train_clears(self):
+        nnet = CachedNNet(self.game, CountingNNet(self.game), 10)
+        nnet.predict(self.boards[0])
+        nnet.train([])
+        nnet.predict(self.boards[0])
+        self.assertEqual((nnet.hits, nnet.misses), (0, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+"""
+Tests for the self-play of Coach: lockstep games, the self-play worker pool
+and the asynchronous pipeline. Like test_mcts.py, they need no deep learning
+framework:
+
+    python -m pytest test_coach.py
+"""
+
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+import Coach as coach
+from Coach import Coach
+from InferenceServer import InferenceServer
+from test_mcts import CountingNNet, FakeNNet
+from tictactoe.TicTacToeGame import TicTacToeGame
+from utils import dotdict
+
+
+class VersionNNet(FakeNNet):
+    """
+    A FakeNNet whose weights are a version number, which is its value for
+    every board. train increments it, and the checkpoints are real files.
+    """
+
+    def __init__(self, game):
+        super(VersionNNet, self).__init__(game)
+        self.version = 0
+
+    def train(self, examples):
+        self.version += 1
+
+    def predict(self, board):
+        pi, _ = super(VersionNNet, self).predict(board)
+        return pi, self.version
+
+    def save_checkpoint(self, folder, filename):
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        with open(os.path.join(folder, filename), 'w') as f:
+            f.write(str(self.version))
+
+    def load_checkpoint(self, folder, filename):
+        with open(os.path.join(folder, filename)) as f:
+            self.version = int(f.read())
+
+
+class TestLockstepSelfPlay(unittest.TestCase):
+
+    def test_plays_all_episodes_in_batches(self):
+        game = TicTacToeGame()
+        nnet = CountingNNet(game)
+        args = dotdict({'numEps': 5, 'numLockstepGames': 3, 'numMCTSSims': 10, 'cpuct': 1.0, 'tempThreshold': 4})
+        episodes = list(Coach(game, nnet, args).executeEpisodesLockstep())
+
+        self.assertEqual(len(episodes), 5)
+        for examples in episodes:
+            for board, pi, v in examples:
+                self.assertEqual(board.shape, (3, 3))
+                self.assertAlmostEqual(sum(pi), 1)
+                self.assertIn(v, [-1, 1, 1e-4, -1e-4])
+        self.assertEqual(max(nnet.batches), 3)
+
+    def test_batched_leaves_need_no_array_engine(self):
+        # the lockstep games build their own ArrayMCTS, whatever args.mctsEngine
+        game = TicTacToeGame()
+        nnet = CountingNNet(game)
+        args = dotdict({'numEps': 2, 'numLockstepGames': 2, 'mctsBatchSize': 4, 'numMCTSSims': 8,
+                        'cpuct': 1.0, 'tempThreshold': 4})
+        episodes = list(Coach(game, nnet, args).executeEpisodesLockstep())
+
+        self.assertEqual(len(episodes), 2)
+        self.assertGreater(max(nnet.batches), 2)
+
+
+class TestSelfPlayPool(unittest.TestCase):
+
+    def test_plays_episodes_in_workers(self):
+        game = TicTacToeGame()
+        children = set(multiprocessing.active_children())
+        with tempfile.TemporaryDirectory() as folder:
+            args = dotdict({'numIters': 2, 'numEps': 4, 'tempThreshold': 4, 'updateThreshold': 0.6,
+                            'maxlenOfQueue': 1000, 'numMCTSSims': 5, 'arenaCompare': 2, 'cpuct': 1.0,
+                            'checkpoint': folder, 'numItersForTrainExamplesHistory': 20, 'numSelfPlayWorkers': 2})
+            coach = Coach(game, VersionNNet(game), args)
+            coach.learn()
+
+            self.assertEqual(len(coach.trainExamplesHistory), 2)
+            for examples in coach.trainExamplesHistory:
+                # 4 episodes of at least 5 moves, each with its 8 symmetrical forms
+                self.assertEqual(len(examples) % 8, 0)
+                self.assertGreaterEqual(len(examples), 4 * 5 * 8)
+                for board, pi, v in examples:
+                    self.assertEqual(board.shape, (3, 3))
+                    self.assertAlmostEqual(sum(pi), 1)
+                    self.assertIn(v, [-1, 1, 1e-4, -1e-4])
+
+        # learn stops the workers when it is done
+        self.assertIsNone(coach.selfPlayPool)
+        self.assertEqual(set(multiprocessing.active_children()), children)
+
+
+class TestAsyncPipeline(unittest.TestCase):
+
+    def test_trains_and_gates_every_iteration(self):
+        game = TicTacToeGame()
+        with tempfile.TemporaryDirectory() as folder:
+            args = dotdict({'numIters': 3, 'numEps': 4, 'tempThreshold': 4, 'updateThreshold': 0.6,
+                            'maxlenOfQueue': 1000, 'numMCTSSims': 5, 'arenaCompare': 2, 'cpuct': 1.0,
+                            'checkpoint': folder, 'numItersForTrainExamplesHistory': 20,
+                            'asyncPipeline': True, 'numSelfPlayWorkers': 2})
+            coach = Coach(game, FakeNNet(game), args)
+            coach.learn()
+
+            self.assertEqual([len(examples) > 0 for examples in coach.trainExamplesHistory], [True] * 3)
+            self.assertIsNone(coach.selfPlayPool)
+            # the candidates are removed once gated
+            self.assertFalse([f for f in os.listdir(folder) if f.startswith('candidate_')])
+
+    def test_inference_server_with_checkpoints(self):
+        game = TicTacToeGame()
+        with tempfile.TemporaryDirectory() as folder:
+            args = dotdict({'numIters': 3, 'numEps': 4, 'tempThreshold': 4, 'updateThreshold': 0.0,
+                            'maxlenOfQueue': 1000, 'numMCTSSims': 5, 'arenaCompare': 2, 'cpuct': 1.0,
+                            'checkpoint': folder, 'numItersForTrainExamplesHistory': 20,
+                            'asyncPipeline': True, 'numSelfPlayWorkers': 2, 'inferenceServer': True})
+            coach = Coach(game, VersionNNet(game), args)
+            coach.learn()
+
+            self.assertEqual(coach.nnet.version, 3)
+            self.assertIsNone(coach.inferenceServer)
+            for i in range(4):
+                checkpoint = os.path.join(folder, coach.getCheckpointFile(i))
+                if os.path.isfile(checkpoint):
+                    with open(checkpoint) as f:
+                        self.assertEqual(f.read(), str(i))
+
+    def test_server_loads_accepted_network_before_publishing(self):
+        game = TicTacToeGame()
+        board = game.getInitBoard()
+        server = InferenceServer(game, VersionNNet, 1)
+        try:
+            with tempfile.TemporaryDirectory() as folder:
+                args = dotdict({'arenaCompare': 2, 'numMCTSSims': 2, 'cpuct': 1.0, 'updateThreshold': 0.6,
+                                'checkpoint': folder})
+                nnet = VersionNNet(game)
+                trainer = Coach(game, nnet, args)
+                nnet.save_checkpoint(folder, trainer.getCheckpointFile(0))
+                server.load_checkpoint(folder, trainer.getCheckpointFile(0))
+                accepted = multiprocessing.Value('i', 0)
+                coach.initGatingWorker(game, VersionNNet, args, accepted, server.loader)
+
+                # accepted: the server evaluates with the candidate as soon as the match returns
+                nnet.version = 7
+                nnet.save_checkpoint(folder, trainer.getCandidateFile(1))
+                coach.worker.isAccepted = lambda pwins, nwins: True
+                coach.playGatingMatch(1)
+                self.assertEqual(accepted.value, 1)
+                self.assertEqual(server.clients[0].predict(board)[1], 7)
+
+                # rejected: the server keeps the accepted network
+                nnet.version = 9
+                nnet.save_checkpoint(folder, trainer.getCandidateFile(2))
+                coach.worker.isAccepted = lambda pwins, nwins: False
+                coach.playGatingMatch(2)
+                self.assertEqual(accepted.value, 1)
+                self.assertEqual(server.clients[0].predict(board)[1], 7)
+        finally:
+            server.stop()
+            coach.worker = None
+
+    def test_needs_self_play_workers(self):
+        game = TicTacToeGame()
+        with self.assertRaises(ValueError):
+            Coach(game, FakeNNet(game), dotdict({'asyncPipeline': True}))
+
+
+if __name__ == '__main__':
+    unittest.main()
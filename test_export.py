@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from ExportedNNet import ExportedNNet, hasOnnxRuntime
+from export import exportNNet
+from othello.OthelloGame import OthelloGame
+from othello.pytorch import NNet
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.numChannels = NNet.args.num_channels
+        NNet.args.num_channels = 16
+        self.game = OthelloGame(6)
+        self.nnet = NNet.NNetWrapper(self.game)
+        # running statistics away from the initial ones, for the BatchNorm folding to matter
+        with torch.no_grad():
+            for _ in range(5):
+                self.nnet.nnet(torch.randn(16, 6, 6) * 2 + 1)
+        self.nnet.updateInferenceNNet()
+        self.boards = [self.game.getInitBoard(), self.game.getCanonicalForm(self.game.getInitBoard(), -1),
+                       np.random.choice([-1, 0, 1], size=(6, 6))]
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        NNet.args.num_channels = self.numChannels
+        self.folder.cleanup()
+
+    def assertSamePredictions(self, filename):
+        exported = ExportedNNet(self.game)
+        exported.load_checkpoint(self.folder.name, filename)
+        pis, vs = exported.predict_batch(self.boards)
+        expectedPis, expectedVs = self.nnet.predict_batch(self.boards)
+        np.testing.assert_allclose(pis, expectedPis, atol=1e-5)
+        np.testing.assert_allclose(vs, expectedVs, atol=1e-5)
+        pi, v = exported.predict(self.boards[2])
+        np.testing.assert_allclose(pi, expectedPis[2], atol=1e-5)
+
+    def test_fused_network(self):
+        fused = self.nnet.nnet.fuseBatchNorm()
+        self.assertFalse(any(isinstance(m, torch.nn.BatchNorm2d) for m in fused.modules()))
+        self.assertTrue(self.nnet.nnet.training)  # the original is untouched
+        exported = exportNNet(self.nnet, self.folder.name, 'best', formats=['torchscript'])
+        self.assertEqual(len(exported), 1)
+        self.assertSamePredictions('best.pt')
+
+    def test_inference_nnet(self):
+        # predictions come from the folded copy, the same as from the network in eval mode
+        pis, vs = self.nnet.predict_batch(self.boards)
+        self.nnet.nnet.eval()
+        with torch.no_grad():
+            expectedPis, expectedVs = self.nnet.nnet(torch.FloatTensor(np.array(self.boards)))
+        np.testing.assert_allclose(pis, torch.exp(expectedPis).numpy(), atol=1e-5)
+        np.testing.assert_allclose(vs, expectedVs.numpy()[:, 0], atol=1e-5)
+
+        # training trains the original module, then folds it again
+        NNet.args.epochs, epochs = 1, NNet.args.epochs
+        try:
+            self.nnet.train([(board, np.ones(37) / 37, 1) for board in self.boards] * 30)
+        finally:
+            NNet.args.epochs = epochs
+        self.assertTrue(any(isinstance(m, torch.nn.BatchNorm2d) for m in self.nnet.nnet.modules()))
+        self.assertFalse(np.allclose(self.nnet.predict_batch(self.boards)[1], vs))
+
+    @unittest.skipUnless(hasOnnxRuntime(), 'needs onnxruntime')
+    def test_onnx(self):
+        exportNNet(self.nnet, self.folder.name, 'best')
+        self.assertSamePredictions('best.onnx')
+        self.assertSamePredictions('best')
+
+
+if __name__ == '__main__':
+    unittest.main()
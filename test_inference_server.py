@@ -0,0 +1,35 @@
+import unittest
+
+import numpy as np
+
+from InferenceServer import InferenceServer
+from test_mcts import FakeNNet
+from tictactoe.TicTacToeGame import TicTacToeGame
+
+
+class TestInferenceServer(unittest.TestCase):
+
+    def setUp(self):
+        self.game = TicTacToeGame()
+        self.server = InferenceServer(self.game, FakeNNet, 2, maxBatch=4)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_clients_get_their_own_answers(self):
+        nnet = FakeNNet(self.game)
+        board = self.game.getInitBoard()
+        boards = [self.game.getNextState(board, 1, a)[0] for a in range(9)]
+
+        pis, vs = self.server.clients[0].predict_batch(boards)
+        pi, v = self.server.clients[1].predict(boards[0])
+
+        expectedPis, expectedVs = nnet.predict_batch(boards)
+        np.testing.assert_allclose(pis, expectedPis)
+        np.testing.assert_allclose(vs, expectedVs)
+        np.testing.assert_allclose(pi, expectedPis[0])
+        self.assertAlmostEqual(v, expectedVs[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
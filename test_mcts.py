@@ -0,0 +1,360 @@
+"""
+Tests for the MCTS engines. They use a stand-in for the neural network that
+needs no deep learning framework, so they can run anywhere numpy is
+installed:
+
+    python -m pytest test_mcts.py
+"""
+
+import tracemalloc
+import unittest
+import zlib
+
+import numpy as np
+
+from ArrayMCTS import ArrayMCTS
+from CachedNNet import CachedNNet
+from Coach import Coach
+from MCTS import MCTS, bestUCBAction
+from NeuralNet import NeuralNet
+from gobang.GobangGame import GobangGame
+from othello.OthelloGame import OthelloGame
+from tafl.TaflGame import TaflGame
+from tictactoe.TicTacToeGame import TicTacToeGame
+from utils import dotdict
+
+
+class FakeNNet(NeuralNet):
+    """
+    Returns a policy and value that are a fixed pseudo-random function of the
+    board, so that two searches over the same positions see the same numbers.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.action_size = game.getActionSize()
+
+    def predict(self, board):
+        s = self.game.stringRepresentation(board)
+        rng = np.random.RandomState(zlib.crc32(s if isinstance(s, bytes) else s.encode()))
+        return rng.dirichlet(np.ones(self.action_size)), rng.uniform(-1, 1)
+
+
+def playSelfPlayGame(game, mcts):
+    """
+    Plays one game with mcts choosing the moves, returning the action
+    probabilities returned at every move.
+    """
+    allProbs = []
+    board = game.getInitBoard()
+    curPlayer = 1
+    while game.getGameEnded(board, curPlayer) == 0:
+        probs = mcts.getActionProb(game.getCanonicalForm(board, curPlayer), temp=1)
+        allProbs.append(probs)
+        board, curPlayer = game.getNextState(board, curPlayer, int(np.argmax(probs)))
+    return allProbs
+
+
+def getTreeBoards(mcts, root):
+    """
+    Returns the canonical boards of the nodes of an ArrayMCTS reachable from
+    root, the root of a search, rebuilt from the board of root.
+    """
+    boards = {root: mcts.rootBoards[root]}
+    frontier = [root]
+    while frontier:
+        node = frontier.pop()
+        for a in np.flatnonzero(mcts.children[node] >= 0):
+            child = mcts.children[node, a]
+            if child not in boards:
+                boards[child] = mcts.getChildBoard(boards[node], a)
+                frontier.append(child)
+    return list(boards.values())
+
+
+class RecursiveMCTS(MCTS):
+    """
+    MCTS with the recursive search it used before the search became a loop,
+    as the reference for the iterative one.
+    """
+
+    def search(self, canonicalBoard, boardHash=None):
+        s = self.game.stringRepresentation(canonicalBoard)
+
+        if s not in self.Es:
+            self.Es[s] = self.game.getGameEnded(canonicalBoard, 1)
+        if self.Es[s] != 0:
+            # terminal node
+            return -self.Es[s]
+
+        if s not in self.Ps:
+            # leaf node
+            self.Ps[s], v = self.nnet.predict(canonicalBoard)
+            valids = self.game.getValidMoves(canonicalBoard, 1)
+            self.Ps[s] = self.Ps[s] * valids  # masking invalid moves
+            sum_Ps_s = np.sum(self.Ps[s])
+            if sum_Ps_s > 0:
+                self.Ps[s] /= sum_Ps_s  # renormalize
+            else:
+                self.Ps[s] = self.Ps[s] + valids
+                self.Ps[s] /= np.sum(self.Ps[s])
+
+            self.Vs[s] = valids
+            self.Ns[s] = 0
+            self.Qsa[s] = np.zeros(self.game.getActionSize())
+            self.Nsa[s] = np.zeros(self.game.getActionSize(), dtype=np.int64)
+            return -np.ravel(v)[0]
+
+        # pick the action with the highest upper confidence bound
+        a = bestUCBAction(self.Qsa[s], self.Nsa[s], self.Ps[s], self.Ns[s], self.Vs[s], self.args.cpuct)
+        next_s, next_player = self.game.getNextState(canonicalBoard, 1, a)
+        next_s = self.game.getCanonicalForm(next_s, next_player)
+
+        v = self.search(next_s)
+
+        self.Qsa[s][a] = (self.Nsa[s][a] * self.Qsa[s][a] + v) / (self.Nsa[s][a] + 1)
+        self.Nsa[s][a] += 1
+
+        self.Ns[s] += 1
+        return -v
+
+
+class TestIterativeSearch(unittest.TestCase):
+
+    def assertSameStatistics(self, game):
+        # RecursiveMCTS keys states by stringRepresentation
+        args = dotdict({'numMCTSSims': 25, 'cpuct': 1.0, 'boardHashKeys': False})
+        expected = RecursiveMCTS(game, FakeNNet(game), args)
+        actual = MCTS(game, FakeNNet(game), args)
+        self.assertEqual(playSelfPlayGame(game, expected), playSelfPlayGame(game, actual))
+
+        for name in ['Qsa', 'Nsa', 'Ns', 'Ps', 'Es', 'Vs']:
+            e, a = getattr(expected, name), getattr(actual, name)
+            self.assertEqual(e.keys(), a.keys(), name)
+            for s in e:
+                np.testing.assert_array_equal(a[s], e[s], name)
+
+    def test_othello(self):
+        self.assertSameStatistics(OthelloGame(6))
+
+    def test_tictactoe(self):
+        self.assertSameStatistics(TicTacToeGame())
+
+
+class TestBoardHashKeys(unittest.TestCase):
+
+    def test_same_search_as_string_keys(self):
+        for game in [OthelloGame(6), TicTacToeGame(), GobangGame(6, 4), TaflGame('Brandubh')]:
+            nnet = FakeNNet(game)
+            stringKeys = MCTS(game, nnet, dotdict({'numMCTSSims': 25, 'cpuct': 1.0, 'boardHashKeys': False}))
+            hashKeys = MCTS(game, nnet, dotdict({'numMCTSSims': 25, 'cpuct': 1.0}))
+            self.assertTrue(hashKeys.hashKeys)
+            expected, actual = playSelfPlayGame(game, stringKeys), playSelfPlayGame(game, hashKeys)
+            self.assertEqual(len(expected), len(actual))
+            for e, a in zip(expected, actual):
+                np.testing.assert_allclose(a, e)
+            self.assertEqual(len(stringKeys.Es), len(hashKeys.Es))
+
+    def test_incremental_hash_matches_board(self):
+        for game in [OthelloGame(6), TicTacToeGame(), GobangGame(6, 4), TaflGame('Brandubh')]:
+            rng = np.random.RandomState(0)
+            board, player = game.getInitBoard(), 1
+            boardHash = game.getBoardHash(board)
+            while game.getGameEnded(board, player) == 0:
+                canonicalHash = game.getCanonicalHash(boardHash, player)
+                self.assertEqual(canonicalHash, game.getBoardHash(game.getCanonicalForm(board, player)))
+                action = rng.choice(np.flatnonzero(game.getValidMoves(board, player)))
+                board, player, boardHash = game.getNextStateHash(board, player, action, boardHash)
+                self.assertEqual(boardHash, game.getBoardHash(board))
+
+
+class TestArrayMCTS(unittest.TestCase):
+
+    def assertSameSearch(self, game, args):
+        nnet = FakeNNet(game)
+        expected = playSelfPlayGame(game, MCTS(game, nnet, args))
+        actual = playSelfPlayGame(game, ArrayMCTS(game, nnet, args))
+        self.assertEqual(len(expected), len(actual))
+        for e, a in zip(expected, actual):
+            np.testing.assert_allclose(a, e)
+
+    def test_othello_matches_mcts(self):
+        self.assertSameSearch(OthelloGame(6), dotdict({'numMCTSSims': 25, 'cpuct': 1.0}))
+
+    def test_tictactoe_matches_mcts(self):
+        self.assertSameSearch(TicTacToeGame(), dotdict({'numMCTSSims': 25, 'cpuct': 1.0}))
+
+    def test_arrays_grow(self):
+        self.assertSameSearch(TicTacToeGame(), dotdict({'numMCTSSims': 25, 'cpuct': 1.0, 'mctsCapacity': 2}))
+
+    def measureTree(self, mcts, game):
+        # the memory the tree of one search takes
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            mcts.getActionProb(game.getInitBoard())
+            return tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+
+    def test_less_memory_than_mcts(self):
+        game = OthelloGame(6)
+        args = dotdict({'numMCTSSims': 400, 'cpuct': 1.0, 'mctsCapacity': 16})
+        expected = self.measureTree(MCTS(game, FakeNNet(game), args), game)
+        arrayMCTS = ArrayMCTS(game, FakeNNet(game), args)
+        actual = self.measureTree(arrayMCTS, game)
+        self.assertEqual(arrayMCTS.size, 400)
+        self.assertLess(actual, expected)
+
+
+class TestReroot(unittest.TestCase):
+
+    def playRerootingGame(self, game, mcts):
+        allProbs = []
+        sizes = []
+        board = game.getInitBoard()
+        curPlayer = 1
+        while game.getGameEnded(board, curPlayer) == 0:
+            canonicalBoard = game.getCanonicalForm(board, curPlayer)
+            mcts.reroot(canonicalBoard)
+            sizes.append(len(mcts.Es) if isinstance(mcts, MCTS) else mcts.size)
+            probs = mcts.getActionProb(canonicalBoard, temp=1)
+            allProbs.append(probs)
+            board, curPlayer = game.getNextState(board, curPlayer, int(np.argmax(probs)))
+        return allProbs, sizes
+
+    def test_engines_keep_the_same_subtree(self):
+        for game in [OthelloGame(6), TicTacToeGame()]:
+            args = dotdict({'numMCTSSims': 25, 'cpuct': 1.0})
+            expected, expectedSizes = self.playRerootingGame(game, MCTS(game, FakeNNet(game), args))
+            actual, actualSizes = self.playRerootingGame(game, ArrayMCTS(game, FakeNNet(game), args))
+            self.assertEqual(expectedSizes, actualSizes)
+            for e, a in zip(expected, actual):
+                np.testing.assert_allclose(a, e)
+
+    def test_keeps_child_statistics(self):
+        game = OthelloGame(6)
+        mcts = ArrayMCTS(game, FakeNNet(game), dotdict({'numMCTSSims': 50, 'cpuct': 1.0}))
+        board = game.getInitBoard()
+        action = int(np.argmax(mcts.getActionProb(board)))
+        child, childBoard = mcts.getChild(mcts.getNode(board), board, action)
+        childNsa = mcts.Nsa[child].copy()
+
+        mcts.reroot(childBoard)
+        np.testing.assert_array_equal(mcts.Nsa[mcts.getNode(childBoard)], childNsa)
+        self.assertEqual(mcts.Nsa[:mcts.size].sum(), mcts.Ns[:mcts.size].sum())
+        self.assertNotIn(mcts.getKey(board), mcts.nodes)
+
+        mcts.reroot(game.getInitBoard())
+        self.assertEqual(mcts.size, 0)
+
+    def test_arena_player_starts_games_with_a_new_tree(self):
+        game = TicTacToeGame()
+        nnet = FakeNNet(game)
+        predictions = []
+        predict = nnet.predict
+        nnet.predict = lambda board: predictions.append(board) or predict(board)
+        args = dotdict({'numMCTSSims': 10, 'cpuct': 1.0, 'reuseTree': True})
+        player = Coach(game, nnet, args).getArenaPlayer(MCTS(game, nnet, args))
+        board = game.getInitBoard()
+
+        # a new tree evaluates the root first
+        player(board)
+        np.testing.assert_array_equal(predictions[0], board)
+        del predictions[:]
+        player(board)
+        self.assertFalse(np.array_equal(predictions[0], board))  # the tree of the first search is kept
+
+        del predictions[:]
+        player.startGame()
+        player(board)
+        np.testing.assert_array_equal(predictions[0], board)
+
+
+class CountingNNet(FakeNNet):
+    """
+    FakeNNet that counts the calls to predict_batch.
+    """
+
+    def __init__(self, game):
+        super().__init__(game)
+        self.batches = []
+
+    def predict_batch(self, boards):
+        self.batches.append(len(boards))
+        return super().predict_batch(boards)
+
+
+class TestBatchedArrayMCTS(unittest.TestCase):
+
+    def test_batches_leaves(self):
+        game = OthelloGame(6)
+        nnet = CountingNNet(game)
+        mcts = ArrayMCTS(game, nnet, dotdict({'numMCTSSims': 64, 'cpuct': 1.0, 'mctsBatchSize': 8}))
+        board = game.getInitBoard()
+        probs = mcts.getActionProb(board)
+        root = mcts.getNode(board)
+
+        self.assertAlmostEqual(sum(probs), 1)
+        # the first simulation expands the root, every other one goes through it
+        self.assertEqual(mcts.Nsa[root].sum(), 63)
+        self.assertLess(len(nnet.batches), 16)
+        self.assertGreater(max(nnet.batches), 1)
+
+    def test_removes_virtual_loss(self):
+        game = TicTacToeGame()
+        mcts = ArrayMCTS(game, FakeNNet(game), dotdict({'numMCTSSims': 50, 'cpuct': 1.0, 'mctsBatchSize': 4}))
+        playSelfPlayGame(game, mcts)
+        nodes = slice(0, mcts.size)
+        np.testing.assert_array_equal(mcts.Nsa[nodes].sum(axis=1), mcts.Ns[nodes])
+        self.assertTrue(np.all(mcts.Nsa[nodes] >= 0))
+        self.assertTrue(np.all(np.abs(mcts.Wsa[nodes]) <= mcts.Nsa[nodes] + 1e-9))
+
+
+class TestSymmetryKeys(unittest.TestCase):
+
+    def test_symmetrical_boards_share_the_key(self):
+        for game in [OthelloGame(6), TicTacToeGame()]:
+            board = game.getInitBoard()
+            action = np.flatnonzero(game.getValidMoves(board, 1))[-1]
+            board = game.getCanonicalForm(game.getNextState(board, 1, action)[0], -1)
+            symBoard, perm = game.getSymmetryCanonicalForm(board)
+            for b, _ in game.getSymmetries(board, np.zeros(game.getActionSize())):
+                s, _ = game.getSymmetryCanonicalForm(b)
+                self.assertEqual(game.stringRepresentation(s), game.stringRepresentation(symBoard))
+            # playing action a on symBoard is playing perm[a] on board
+            for a in np.flatnonzero(game.getValidMoves(symBoard, 1)):
+                next_s = game.getNextState(symBoard, 1, a)[0]
+                next_b = game.getNextState(board, 1, perm[a])[0]
+                self.assertEqual(game.stringRepresentation(game.getSymmetryCanonicalForm(next_s)[0]),
+                                 game.stringRepresentation(game.getSymmetryCanonicalForm(next_b)[0]))
+
+    def countSymmetryClasses(self, game, symmetryKeys):
+        mcts = ArrayMCTS(game, FakeNNet(game), dotdict({'numMCTSSims': 100, 'cpuct': 1.0, 'symmetryKeys': symmetryKeys}))
+        board = game.getCanonicalForm(game.getNextState(game.getInitBoard(), 1, 4)[0], -1)
+        probs = mcts.getActionProb(board)
+        self.assertAlmostEqual(sum(probs), 1)
+        self.assertEqual(probs[4], 0)
+        root, _ = mcts.startSearch(board)
+        return len({game.stringRepresentation(game.getSymmetryCanonicalForm(b)[0]) for b in getTreeBoards(mcts, root)})
+
+    def test_search_covers_more_positions(self):
+        game = TicTacToeGame()
+        # with symmetryKeys every node is its own representative, so the same
+        # number of evaluations covers more positions up to symmetry
+        self.assertGreater(self.countSymmetryClasses(game, True), self.countSymmetryClasses(game, False))
+
+    def test_cache_maps_policy_back(self):
+        game = TicTacToeGame()
+        # no symmetry maps this board onto itself, so each symmetrical board has one policy
+        board = game.getNextState(game.getNextState(game.getInitBoard(), 1, 0)[0], -1, 1)[0]
+        nnet = CachedNNet(game, FakeNNet(game), 10, symmetries=True)
+        pi, _ = nnet.predict(board)
+        for symBoard, symPi in game.getSymmetries(board, pi):
+            cachedPi, _ = nnet.predict_batch([symBoard])
+            np.testing.assert_allclose(cachedPi[0], symPi)
+        self.assertEqual(nnet.misses, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from benchmark import compareQuantized, playRandomBoards
+from othello.OthelloGame import OthelloGame
+from othello.pytorch import NNet
+from othello.pytorch.QuantizedNNet import QuantizedNNetWrapper
+
+
+class TestQuantization(unittest.TestCase):
+
+    def setUp(self):
+        self.numChannels, self.epochs = NNet.args.num_channels, NNet.args.epochs
+        NNet.args.num_channels, NNet.args.epochs = 16, 1
+        self.game = OthelloGame(6)
+        np.random.seed(0)
+        self.boards = playRandomBoards(self.game, 300)
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        NNet.args.num_channels, NNet.args.epochs = self.numChannels, self.epochs
+        self.folder.cleanup()
+
+    def test_train_quantizes(self):
+        nnet = QuantizedNNetWrapper(self.game)
+        examples = [(board, self.game.getValidMoves(board, 1) / self.game.getValidMoves(board, 1).sum(), 0)
+                    for board in self.boards[:200]]
+        nnet.train(examples)
+        self.assertIsNotNone(nnet.qnnet)
+
+        kl, mse, agreement = compareQuantized(nnet, self.boards[200:])
+        self.assertLess(kl, 1e-2)
+        self.assertLess(mse, 1e-2)
+        pi, v = nnet.predict(self.boards[200])
+        self.assertEqual(pi.shape, (self.game.getActionSize(),))
+
+    def test_checkpoint_keeps_calibration(self):
+        nnet = QuantizedNNetWrapper(self.game)
+        nnet.calibrate(self.boards[:100])
+        nnet.save_checkpoint(self.folder.name, 'best.pth.tar')
+
+        loaded = QuantizedNNetWrapper(self.game)
+        loaded.load_checkpoint(self.folder.name, 'best.pth.tar')
+        np.testing.assert_allclose(loaded.predict_batch(self.boards[100:])[0],
+                                   nnet.predict_batch(self.boards[100:])[0], atol=1e-6)
+        # the float wrapper loads it too
+        NNet.NNetWrapper(self.game).load_checkpoint(self.folder.name, 'best.pth.tar')
+
+    def test_uncalibrated_checkpoint_predicts_in_float(self):
+        nnet = NNet.NNetWrapper(self.game)
+        nnet.save_checkpoint(self.folder.name, 'best.pth.tar')
+        loaded = QuantizedNNetWrapper(self.game)
+        loaded.load_checkpoint(self.folder.name, 'best.pth.tar')
+        self.assertIsNone(loaded.qnnet)
+        np.testing.assert_allclose(loaded.predict_batch(self.boards)[0], nnet.predict_batch(self.boards)[0],
+                                   atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ReplayBuffer import ReplayBuffer
+
+
+def makeExamples(iteration, count):
+    return [(np.full((3, 3), iteration * 100 + i), np.full(10, 0.1), (-1) ** i) for i in range(count)]
+
+
+class TestReplayBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.tmp.name, 'replay')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_indexes_across_shards(self):
+        buffer = ReplayBuffer(self.folder, 5)
+        buffer.addShard(makeExamples(1, 3))
+        buffer.addShard(makeExamples(2, 4))
+
+        self.assertEqual(len(buffer), 7)
+        board, pi, v = buffer[4]
+        np.testing.assert_array_equal(board, np.full((3, 3), 201))
+        np.testing.assert_allclose(pi, np.full(10, 0.1))
+        self.assertEqual(v, -1)
+        np.testing.assert_array_equal(buffer[-1][0], np.full((3, 3), 203))
+        self.assertEqual(len(list(buffer)), 7)
+        with self.assertRaises(IndexError):
+            buffer[7]
+
+    def test_expires_oldest_shard(self):
+        buffer = ReplayBuffer(self.folder, 2)
+        for iteration in range(1, 4):
+            buffer.addShard(makeExamples(iteration, 2))
+
+        self.assertEqual(len(buffer), 4)
+        np.testing.assert_array_equal(buffer[0][0], np.full((3, 3), 200))
+        self.assertEqual(len(os.listdir(self.folder)), 6)
+
+    def test_load(self):
+        buffer = ReplayBuffer(self.folder, 5)
+        buffer.addShard(makeExamples(1, 3))
+        buffer.addShard(makeExamples(2, 2))
+
+        loaded = ReplayBuffer(self.folder, 1)
+        loaded.load()
+        self.assertEqual(len(loaded), 2)
+        np.testing.assert_array_equal(loaded[1][0], buffer[4][0])
+
+    def test_resume_adds_after_loaded_shards(self):
+        buffer = ReplayBuffer(self.folder, 3)
+        for iteration in range(1, 4):
+            buffer.addShard(makeExamples(iteration, 1))
+
+        # a resumed run starts again at iteration 1
+        resumed = ReplayBuffer(self.folder, 3)
+        resumed.load()
+        resumed.addShard(makeExamples(4, 1))
+        self.assertEqual([shard[0] for shard in resumed.shards], [2, 3, 4])
+        self.assertEqual([board[0, 0] for board, _, _ in resumed], [200, 300, 400])
+
+    def test_load_from_another_folder(self):
+        buffer = ReplayBuffer(self.folder, 2)
+        for iteration in range(1, 3):
+            buffer.addShard(makeExamples(iteration, 1))
+
+        other = ReplayBuffer(os.path.join(self.tmp.name, 'other'), 2)
+        other.load(self.folder)
+        other.addShard(makeExamples(3, 1))
+        self.assertEqual([board[0, 0] for board, _, _ in other], [200, 300])
+        # the new shard and the expiry happen in the new folder only
+        self.assertEqual(len(os.listdir(self.folder)), 6)
+        self.assertEqual(len(os.listdir(other.folder)), 6)
+
+    def test_fresh_start_removes_old_shards(self):
+        old = ReplayBuffer(self.folder, 5)
+        for iteration in range(1, 4):
+            old.addShard(makeExamples(iteration, 1))
+
+        # a new run in the same folder, which doesn't load them
+        buffer = ReplayBuffer(self.folder, 5)
+        buffer.addShard(makeExamples(4, 1))
+        self.assertEqual([shard[0] for shard in buffer.shards], [4])
+        self.assertEqual(len(os.listdir(self.folder)), 3)
+
+        loaded = ReplayBuffer(self.folder, 5)
+        loaded.load()
+        self.assertEqual([board[0, 0] for board, _, _ in loaded], [400])
+
+    def test_load_from_another_folder_removes_old_shards(self):
+        buffer = ReplayBuffer(self.folder, 2)
+        buffer.addShard(makeExamples(1, 1))
+        other = ReplayBuffer(os.path.join(self.tmp.name, 'other'), 5)
+        for iteration in range(2, 5):
+            other.addShard(makeExamples(iteration, 1))
+
+        resumed = ReplayBuffer(other.folder, 5)
+        resumed.load(self.folder)
+        resumed.addShard(makeExamples(5, 1))
+        self.assertEqual([board[0, 0] for board, _, _ in resumed], [100, 500])
+        self.assertEqual(len(os.listdir(other.folder)), 6)
+
+    def test_rejects_boards_that_are_not_arrays(self):
+        buffer = ReplayBuffer(self.folder, 2)
+        with self.assertRaises(ValueError):
+            buffer.addShard([([[0, 1], [1, 0]], np.full(4, 0.25), 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
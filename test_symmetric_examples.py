@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from Coach import Coach
+from NeuralNet import NeuralNet
+from ReplayBuffer import ReplayBuffer
+from SymmetricExamples import SymmetricExamples
+from connect4.Connect4Game import Connect4Game
+from dotsandboxes.DotsAndBoxesGame import DotsAndBoxesGame
+from othello.OthelloGame import OthelloGame
+from tafl.TaflGame import TaflGame
+from tictactoe.TicTacToeGame import TicTacToeGame
+from utils import dotdict, sampleTrainingBatches
+
+
+class TestSymmetricExamples(unittest.TestCase):
+
+    def setUp(self):
+        self.game = OthelloGame(6)
+        rng = np.random.RandomState(0)
+        self.examples = []
+        board, player = self.game.getInitBoard(), 1
+        for _ in range(6):
+            canonicalBoard = self.game.getCanonicalForm(board, player)
+            pi = rng.dirichlet(np.ones(self.game.getActionSize()))
+            self.examples.append((canonicalBoard, pi, player))
+            action = rng.choice(np.flatnonzero(self.game.getValidMoves(board, player)))
+            board, player = self.game.getNextState(board, player, action)
+
+    def assertSymmetricalForm(self, example, board, pi, v):
+        forms = self.game.getSymmetries(example[0], example[1])
+        self.assertTrue(any(np.array_equal(board, b) and np.allclose(pi, p) for b, p in forms))
+        self.assertEqual(v, example[2])
+
+    def test_getitem(self):
+        examples = SymmetricExamples(self.game, self.examples)
+        self.assertEqual(len(examples), 6)
+        for i in range(6):
+            self.assertSymmetricalForm(self.examples[i], *examples[i])
+
+    def test_get_batch(self):
+        ids = [5, 0, 3, 3]
+        with tempfile.TemporaryDirectory() as folder:
+            buffer = ReplayBuffer(os.path.join(folder, 'replay'), 2)
+            buffer.addShard(self.examples[:2])
+            buffer.addShard(self.examples[2:])
+            for examples in [self.examples, buffer]:
+                boards, pis, vs = SymmetricExamples(self.game, examples).getBatch(ids)
+                self.assertEqual(boards.shape, (4, 6, 6))
+                for row, i in enumerate(ids):
+                    self.assertSymmetricalForm(self.examples[i], boards[row], pis[row], vs[row])
+
+    def test_training_batches_draw_new_symmetries(self):
+        np.random.seed(0)
+        examples = SymmetricExamples(self.game, self.examples[3:4])
+        batches = sampleTrainingBatches(examples, 2)
+        forms = set()
+        for _ in range(50):
+            boards, (pis, vs) = next(batches)
+            self.assertEqual(boards.shape, (2, 6, 6))
+            for board, pi, v in zip(boards, pis, vs):
+                self.assertSymmetricalForm(self.examples[3], board, pi, v)
+                forms.add(board.tobytes())
+        self.assertEqual(len(forms), len(self.game.getSymmetries(*self.examples[3][:2])))
+
+
+class TestSymmetriesBatch(unittest.TestCase):
+
+    def test_matches_get_symmetries(self):
+        rng = np.random.RandomState(0)
+        for game in [OthelloGame(6), TicTacToeGame(), DotsAndBoxesGame(3)]:
+            shape = game.getInitBoard().shape
+            boards = rng.randint(-1, 2, size=(3,) + shape)
+            pis = rng.rand(3, game.getActionSize())
+            symBoards, symPis = game.getSymmetriesBatch(boards, pis)
+            forms = [form for board, pi in zip(boards, pis) for form in game.getSymmetries(board, pi)]
+            self.assertEqual(symBoards.shape, (len(forms),) + shape)
+            for symBoard, symPi, (board, pi) in zip(symBoards, symPis, forms):
+                np.testing.assert_array_equal(symBoard, board)
+                np.testing.assert_allclose(symPi, pi)
+
+    def test_episode_examples(self):
+        rng = np.random.RandomState(0)
+        for game in [OthelloGame(6), Connect4Game(), TaflGame('Brandubh')]:
+            coach = Coach(game, NeuralNet(game), dotdict({'numMCTSSims': 2, 'cpuct': 1.0}))
+            positions = []
+            board, player = game.getInitBoard(), 1
+            for _ in range(4):
+                pi = rng.dirichlet(np.ones(game.getActionSize()))
+                positions.append([game.getCanonicalForm(board, player), player, pi])
+                action = rng.choice(np.flatnonzero(game.getValidMoves(board, player)))
+                board, player = game.getNextState(board, player, action)
+
+            # the same examples as getSymmetries of each position
+            expected = [(b, p, -1 if position[1] == player else 1)
+                        for position in positions for b, p in game.getSymmetries(position[0], position[2])]
+            examples = coach.getEpisodeExamples(positions, -1, player)
+            self.assertEqual(len(examples), len(expected))
+            for (board, pi, v), (expectedBoard, expectedPi, expectedV) in zip(examples, expected):
+                self.assertEqual(game.stringRepresentation(board), game.stringRepresentation(expectedBoard))
+                np.testing.assert_allclose(pi, expectedPi)
+                self.assertEqual(v, expectedV)
+
+    def test_episode_examples_without_permutations(self):
+        class MirrorOnlyWhenEmptyGame(Connect4Game):
+            # a number of forms that depends on the board, which no permutation table can describe
+            def getSymmetries(self, board, pi):
+                forms = super(MirrorOnlyWhenEmptyGame, self).getSymmetries(board, pi)
+                return forms if not board.any() else forms[:1]
+
+        game = MirrorOnlyWhenEmptyGame()
+        self.assertIsNone(game.getSymmetryPermutations())
+        coach = Coach(game, NeuralNet(game), dotdict({'numMCTSSims': 2, 'cpuct': 1.0}))
+        pi = np.ones(game.getActionSize()) / game.getActionSize()
+        board = game.getInitBoard()
+        nextBoard = game.getNextState(board, 1, 3)[0]
+        examples = coach.getEpisodeExamples([[board, 1, pi], [game.getCanonicalForm(nextBoard, -1), -1, pi]], 1, 1)
+        self.assertEqual([v for _, _, v in examples], [1, 1, -1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from tournament import choosePairings, computeElo, findCheckpoints
+
+
+class TestTournament(unittest.TestCase):
+
+    players = ['checkpoint_1.pth.tar', 'checkpoint_2.pth.tar', 'checkpoint_10.pth.tar']
+
+    def test_find_checkpoints(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for filename in self.players + ['best.pth.tar', 'checkpoint_2.pth.tar.examples']:
+                open(os.path.join(folder, filename), 'w').close()
+            self.assertEqual(findCheckpoints(folder), self.players)
+
+    def test_elo(self):
+        # checkpoint_10 wins 3 games in 4 against checkpoint_2, which checkpoint_1 never beats
+        results = [{'player1': a, 'player2': b, 'score': score} for a, b, score in [
+            (self.players[2], self.players[1], 1), (self.players[1], self.players[2], 0),
+            (self.players[2], self.players[1], 0.5), (self.players[1], self.players[2], 0.5),
+            (self.players[1], self.players[0], 1), (self.players[0], self.players[1], 0)]]
+        elo, cov = computeElo(self.players, results)
+        self.assertAlmostEqual(elo.sum(), 0)
+        self.assertTrue(elo[0] < elo[1] < elo[2])
+        self.assertTrue(np.all(np.diag(cov) > 0))
+
+    def test_pairings_spread_over_the_unplayed(self):
+        results = [{'player1': self.players[0], 'player2': self.players[1], 'score': 0.5}] * 20
+        pairings = choosePairings(self.players, results, 2)
+        self.assertTrue(all(self.players[2] in pairing for pairing in pairings))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,8 @@
 from __future__ import print_function
 import sys
 sys.path.append('..')
-from Game import Game
+from Game import Game, symmetryPermutations
+from ZobristHash import ZobristHash
 from .TicTacToeLogic import Board
 import numpy as np
 
@@ -17,6 +18,10 @@ Based on the OthelloGame by Surag Nair.
 class TicTacToeGame(Game):
     def __init__(self, n=3):
         self.n = n
+        # mirror, rotational, see Game.getSymmetryPermutations
+        self.boardPerms, self.piPerms = symmetryPermutations(self._transformSymmetries, self.getBoardSize(),
+                                                             self.getActionSize())
+        self.zobrist = ZobristHash(self.n*self.n)
 
     def getInitBoard(self):
         # return initial board (numpy board)
@@ -42,6 +47,13 @@ class TicTacToeGame(Game):
         b.execute_move(move, player)
         return (b.pieces, -player)
 
+    def getNextStateHash(self, board, player, action, boardHash):
+        # getNextState, updating the hash pair with the new piece
+        nextBoard, nextPlayer = self.getNextState(board, player, action)
+        if action != self.n*self.n:
+            boardHash = self.zobrist.updatePair(boardHash, action, 0, player)
+        return (nextBoard, nextPlayer, boardHash)
+
     def getValidMoves(self, board, player):
         # return a fixed size binary vector
         valids = [0]*self.getActionSize()
@@ -74,7 +86,7 @@ class TicTacToeGame(Game):
         # return state if player==1, else return -state if player==-1
         return player*board
 
-    def getSymmetries(self, board, pi):
+    def _transformSymmetries(self, board, pi):
         # mirror, rotational
         assert(len(pi) == self.n**2+1)  # 1 for pass
         pi_board = np.reshape(pi[:-1], (self.n, self.n))
@@ -0,0 +1,245 @@
+"""
+use this script to rank the checkpoints saved by Coach (checkpoint_*.pth.tar)
+on an Elo ladder:
+
+    python tournament.py ./temp/
+    python tournament.py ./temp/ --games 400 --workers 4 --sims 50
+
+Games are played in --workers processes, each loading every network it needs
+once. Pairings are chosen round by round, --round games at a time, where they
+tell the most about the ratings: between players whose rating difference is
+the least certain and whose result is the hardest to predict.
+
+The result of every game is appended to a JSON lines file as soon as it is
+known (by default tournament.jsonl in the checkpoint folder). Running the
+script again resumes the tournament: the games already in the file count
+towards --games, and new checkpoints join the ladder.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+
+import coloredlogs
+import numpy as np
+from tqdm import tqdm
+
+from Arena import Arena
+from MCTS import createMCTS
+from othello.OthelloGame import OthelloGame as Game
+from othello.pytorch.NNet import NNetWrapper as nn
+from utils import *
+
+log = logging.getLogger(__name__)
+
+args = dotdict({
+    'numMCTSSims': 25,          # Number of games moves for MCTS to simulate.
+    'cpuct': 1,
+    'eloPrior': 1000,           # Standard deviation, in Elo, of the prior keeping the ratings of unplayed networks finite.
+})
+
+ELO = 400 / math.log(10)  # Elo points per natural log unit of the odds of winning
+
+
+def findCheckpoints(folder):
+    """
+    Returns the checkpoint_*.pth.tar files of folder, by iteration.
+    """
+    filenames = [os.path.basename(f) for f in glob.glob(os.path.join(folder, 'checkpoint_*.pth.tar'))]
+    return sorted(filenames, key=lambda f: int(re.search(r'checkpoint_(\d+)\.pth\.tar$', f).group(1)))
+
+
+def loadResults(filename):
+    """
+    Returns the games saved in the results file, a list of dicts with the
+    player1 and player2 checkpoints and the score of player1 (1 for a win,
+    0.5 for a draw, 0 for a loss).
+    """
+    if not os.path.isfile(filename):
+        return []
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def computeElo(players, results, prior=1000):
+    """
+    Fits the Bradley-Terry model to the results of the games between players,
+    a draw counting as half a win for each, with a normal prior of standard
+    deviation prior (in Elo) on every rating.
+
+    Returns:
+        elo: the rating of every player, in Elo, centered on 0
+        cov: their covariance matrix, in Elo squared
+    """
+    index = {player: i for i, player in enumerate(players)}
+    games = [(index[r['player1']], index[r['player2']], r['score']) for r in results
+             if r['player1'] in index and r['player2'] in index]
+    i, j, s = (np.array(column) for column in zip(*games)) if games else (np.zeros(0, dtype=int),) * 3
+    precision = (ELO / prior) ** 2
+
+    ratings = np.zeros(len(players))  # in natural units
+    for _ in range(50):
+        # Newton steps on the negative log posterior
+        p = 1 / (1 + np.exp(ratings[j] - ratings[i]))
+        gradient = precision * ratings
+        np.add.at(gradient, i, p - s)
+        np.add.at(gradient, j, s - p)
+        hessian = getHessian(len(players), i, j, p * (1 - p), precision)
+        step = np.linalg.solve(hessian, gradient)
+        ratings -= step
+        if np.max(np.abs(step)) < 1e-9:
+            break
+
+    p = 1 / (1 + np.exp(ratings[j] - ratings[i]))
+    cov = np.linalg.inv(getHessian(len(players), i, j, p * (1 - p), precision))
+    # the ratings are only known up to a common shift, which the centering removes
+    center = np.eye(len(players)) - 1 / len(players)
+    return center @ ratings * ELO, center @ cov @ center * ELO ** 2
+
+
+def getHessian(numPlayers, i, j, weights, precision):
+    """
+    Returns the Hessian of the negative log posterior of computeElo, for
+    games between players i and j where the result has variance weights.
+    """
+    hessian = np.eye(numPlayers) * precision
+    np.add.at(hessian, (i, i), weights)
+    np.add.at(hessian, (j, j), weights)
+    np.add.at(hessian, (i, j), -weights)
+    np.add.at(hessian, (j, i), -weights)
+    return hessian
+
+
+def choosePairings(players, results, numPairs, prior=1000):
+    """
+    Returns numPairs (player1, player2) pairings, the same pair possibly more
+    than once, each to be played twice with either player starting.
+
+    The pairs are picked one after the other, each the one whose two games
+    would reduce the variance of the rating difference of its players the
+    most, counting the games of the pairs picked before it as played.
+    """
+    elo, cov = computeElo(players, results, prior)
+    # the centered covariance is singular, add back the variance of the mean rating
+    precision = np.linalg.inv(cov + prior ** 2 / len(players))
+    pairings = []
+    for _ in range(numPairs):
+        best = None
+        for a in range(len(players)):
+            for b in range(a + 1, len(players)):
+                p = 1 / (1 + 10 ** ((elo[b] - elo[a]) / 400))
+                variance = cov[a, a] + cov[b, b] - 2 * cov[a, b]
+                gain = variance * p * (1 - p) / ELO ** 2
+                if best is None or gain > best[0]:
+                    best = (gain, a, b, p)
+        _, a, b, p = best
+        pairings.append((players[a], players[b]))
+        # the two games count as played
+        direction = np.zeros(len(players))
+        direction[[a, b]] = [1, -1]
+        precision += 2 * p * (1 - p) / ELO ** 2 * np.outer(direction, direction)
+        cov = np.linalg.inv(precision)
+    return pairings
+
+
+def printEloTable(players, results, prior=1000):
+    elo, cov = computeElo(players, results, prior)
+    played = {player: [0, 0] for player in players}  # games, score
+    for r in results:
+        for player, score in [(r['player1'], r['score']), (r['player2'], 1 - r['score'])]:
+            if player in played:
+                played[player][0] += 1
+                played[player][1] += score
+    print(f'{"rank":>4}  {"checkpoint":<28}{"Elo":>7}{"+/-":>7}{"games":>7}{"score":>8}')
+    for rank, k in enumerate(np.argsort(-elo), 1):
+        games, score = played[players[k]]
+        print(f'{rank:>4}  {players[k]:<28}{elo[k]:>7.0f}{2 * math.sqrt(cov[k, k]):>7.0f}{games:>7}'
+              f'{score / games if games else 0:>8.1%}')
+
+
+nnets = {}  # checkpoint -> the network loaded by a worker process
+worker = None  # the (game, folder, args) of a worker process
+
+
+def initTournamentWorker(game, folder, args):
+    global worker
+    worker = (game, folder, args)
+
+
+def getNNet(filename):
+    game, folder, _ = worker
+    if filename not in nnets:
+        nnets[filename] = nn(game)
+        nnets[filename].load_checkpoint(folder=folder, filename=filename)
+    return nnets[filename]
+
+
+def playTournamentGame(task):
+    """
+    Plays one game between the checkpoints player1 and player2, player1
+    starting, each with a new search tree.
+
+    Returns:
+        player1, player2, score: the score of player1, 1, 0.5 or 0
+    """
+    player1, player2, seed = task
+    game, _, args = worker
+    np.random.seed(seed)
+    players = []
+    for filename in [player1, player2]:
+        mcts = createMCTS(game, getNNet(filename), args)
+        players.append(lambda board, mcts=mcts: np.argmax(mcts.getActionProb(board, temp=0)))
+    gameResult = Arena(players[0], players[1], game).playGame()
+    score = 1 if gameResult == 1 else 0 if gameResult == -1 else 0.5
+    return player1, player2, score
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('folder', help='folder of the checkpoint_*.pth.tar files')
+    parser.add_argument('--games', type=int, default=200, help='games to play in total, resumed games included')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='processes playing games')
+    parser.add_argument('--round', type=int, default=0, help='games per round of pairings (default: 4 per worker)')
+    parser.add_argument('--sims', type=int, default=args.numMCTSSims, help='numMCTSSims')
+    parser.add_argument('--results', help='results file (default: tournament.jsonl in folder)')
+    options = parser.parse_args()
+    args.numMCTSSims = options.sims
+    roundGames = options.round or 4 * options.workers
+    resultsFile = options.results or os.path.join(options.folder, 'tournament.jsonl')
+
+    players = findCheckpoints(options.folder)
+    if len(players) < 2:
+        log.error(f'Found {len(players)} checkpoints in "{options.folder}", the tournament needs 2.')
+        return
+    results = loadResults(resultsFile)
+    log.info(f'{len(players)} checkpoints, {len(results)} games played already')
+
+    g = Game(6)
+    context = getSpawnContext()
+    with context.Pool(options.workers, initializer=initTournamentWorker, initargs=(g, options.folder, args)) as pool, \
+            open(resultsFile, 'a') as f, tqdm(initial=len(results), total=options.games, desc='Tournament') as progress:
+        while len(results) < options.games:
+            numPairs = math.ceil(min(roundGames, options.games - len(results)) / 2)
+            tasks = []
+            for player1, player2 in choosePairings(players, results, numPairs, args.eloPrior):
+                tasks.append((player1, player2, int(np.random.randint(2 ** 31))))
+                tasks.append((player2, player1, int(np.random.randint(2 ** 31))))
+            for player1, player2, score in pool.imap_unordered(playTournamentGame, tasks):
+                result = {'player1': player1, 'player2': player2, 'score': score}
+                results.append(result)
+                # saved game by game, so an interrupted tournament can be resumed
+                f.write(json.dumps(result) + '\n')
+                f.flush()
+                progress.update()
+
+    printEloTable(players, results, args.eloPrior)
+
+
+if __name__ == "__main__":
+    coloredlogs.install(level='INFO')
+    main()
@@ -1,3 +1,8 @@
+import multiprocessing
+
+import numpy as np
+
+
 class AverageMeter(object):
     """From https://github.com/pytorch/examples/blob/master/imagenet/main.py"""
 
@@ -19,4 +24,60 @@ class AverageMeter(object):
 
 class dotdict(dict):
     def __getattr__(self, name):
-        return self[name]
+        try:
+            return self[name]
+        except KeyError:
+            # so that getattr(args, name, default) works for optional args
+            raise AttributeError(name)
+
+
+def getSpawnContext():
+    """
+    Returns the multiprocessing context the worker pools and processes are
+    started with: spawn rather than fork, which doesn't mix with the threads
+    of deep learning frameworks.
+    """
+    return multiprocessing.get_context('spawn')
+
+
+def compileKerasPredict(model):
+    """
+    Returns a tf.function that calls the keras model on a float32 batch of
+    any number of boards, for the predict_batch of the keras NNetWrappers.
+    model.predict sets up a tf.data pipeline on every call, which costs more
+    than the network at batch size 1. The weights are read at every call, so
+    training and load_weights are picked up.
+    """
+    import tensorflow as tf
+    return tf.function(lambda boards: model(boards, training=False),
+                       input_signature=[tf.TensorSpec(model.inputs[0].shape, tf.float32)])
+
+
+def sampleTrainingBatches(examples, batchSize, prepare=None):
+    """
+    Yields (boards, (pis, vs)) batches of batchSize examples drawn at random,
+    for ever. Like the training loop of the pytorch NNetWrappers, a batch is
+    read with examples.getBatch if it has one: SymmetricExamples draws new
+    symmetries for every batch, and a ReplayBuffer reads one batch at a time
+    from disk. prepare, if given, turns the boards of a batch into the input
+    of the network.
+    """
+    while True:
+        ids = np.random.randint(len(examples), size=batchSize)
+        if hasattr(examples, 'getBatch'):
+            boards, pis, vs = examples.getBatch(ids)
+        else:
+            boards, pis, vs = (np.asarray(x) for x in zip(*[examples[i] for i in ids]))
+        if prepare is not None:
+            boards = prepare(boards)
+        yield boards, (pis, vs)
+
+
+def fitKerasModel(model, examples, batchSize, epochs, prepare=None, **kwargs):
+    """
+    Trains the keras model on examples, a list of (board, pi, v) or anything
+    with len and getBatch, for epochs of len(examples) / batchSize batches of
+    sampleTrainingBatches. kwargs are passed on to model.fit.
+    """
+    steps = max(len(examples) // batchSize, 1)
+    model.fit(sampleTrainingBatches(examples, batchSize, prepare), steps_per_epoch=steps, epochs=epochs, **kwargs)